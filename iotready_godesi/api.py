@@ -1,28 +1,33 @@
 import frappe
-from iotready_godesi import picking, webutils, utils
+import json
+from werkzeug.wrappers import Response
+from iotready_godesi import archive, bundles, crate_ids, doc_hooks, exports, firebase_auth, genealogy, ingest, instrumentation, picking, recalls, rollups, webutils, utils
 from iotready_warehouse_traceability_frappe import utils as common_utils
 from iotready_warehouse_traceability_frappe import workflows
-from iotready_firebase import admin
 
 
 
 @frappe.whitelist()
+@instrumentation.instrument
 def get_crate_quantity(crate_id):
     return utils.get_crate_quantity(crate_id)
 
 
 
 @frappe.whitelist()
+@instrumentation.instrument
 def is_picking_complete(picklist_id):
     return picking.is_picking_complete(picklist_id)
 
 
 @frappe.whitelist()
+@instrumentation.instrument
 def mark_picking_as_complete(picklist_id, note=None):
     return picking.mark_as_complete(picklist_id, note)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
 def get_configuration():
     """
     Called by app user to retrieve warehouse configuration.
@@ -31,11 +36,31 @@ def get_configuration():
 
 
 @frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
+def get_validation_bundle(known_hash: str | None = None):
+    """
+    Called by app user to pre-validate scans offline. Pass the hash of the bundle the app holds.
+    """
+    return bundles.get_validation_bundle(known_hash)
+
+
+@frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
 def get_session_summary(session_id: str):
     return webutils.get_session_summary(session_id)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
+def get_crate_table_page(summary_name: str, start: int = 0):
+    """
+    Called by the summary form to fetch the next page of the crate table.
+    """
+    return doc_hooks.get_crate_table_page(summary_name, start)
+
+
+@frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
 def record_events(crate: dict, activity: str):
     """
     Called by app user to upload crate events.
@@ -43,20 +68,66 @@ def record_events(crate: dict, activity: str):
     return common_utils.record_events(crate, activity)
 
 @frappe.whitelist(allow_guest=False)
-def record_session_events(crates: list, session_id: str, metadata: str|None = None):
+@instrumentation.instrument
+def record_session_events(crates: list, session_id: str, metadata: str|None = None, idempotency_key: str|None = None):
     """
     Called by app user to upload crate events.
+    Retries should resend the same idempotency_key to get the original response back.
+    """
+    return webutils.record_session_events(crates, session_id, metadata, idempotency_key)
+
+@frappe.whitelist(allow_guest=False, methods=["POST"])
+@instrumentation.instrument
+def ingest_session_events(events: str | None = None):
+    """
+    Called by app user to replay an offline backlog of crate events.
+    Accepts NDJSON either as the `events` argument or as the raw request body.
     """
-    return webutils.record_session_events(crates, session_id, metadata)
+    if events:
+        lines = events.splitlines()
+    else:
+        # Frappe has already read the body into the request while building form_dict, so the stream is empty
+        lines = frappe.request.get_data(as_text=True).splitlines()
+    return ingest.ingest_session_events(lines)
 
 @frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
 def generate_new_crate():
     """
     Called by app user to create new crate ID.
     """
     return common_utils.new_crate()
 
+@frappe.whitelist(allow_guest=False, methods=["POST"])
+@instrumentation.instrument
+def reserve_crate_id_block(size: int | None = None, device_id: str | None = None):
+    """
+    Called by app user to reserve a contiguous range of crate IDs to assign locally,
+    instead of calling generate_new_crate once per crate.
+    """
+    return crate_ids.reserve_block(size, device_id)
+
+@frappe.whitelist(allow_guest=False, methods=["POST"])
+@instrumentation.instrument
+def generate_labels(crates: list | str, reserve: bool = False):
+    """
+    Called by app user to print many labels at once, e.g. to pre-label empty crates or reprint after a jam.
+    `crates` is a list of {crate_id, item_code, quantity, weight}; crate_id may be left out when `reserve` is set.
+    The first line of the response is JSON, {"crate_ids": [...]}, in the order of `crates`;
+    the printer-language stream follows it.
+    """
+    if isinstance(crates, str):
+        crates = json.loads(crates)
+    labelled_ids, labels = utils.generate_labels(utils.get_user_warehouse(), crates, frappe.utils.cint(reserve))
+
+    def stream():
+        yield json.dumps({"crate_ids": labelled_ids}) + "\n"
+        yield from labels
+
+    return Response(stream(), mimetype="text/plain")
+
 @frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
 def identify_crate(crate_id : str):
     """
     Called by app user to identify a crate.
@@ -64,6 +135,64 @@ def identify_crate(crate_id : str):
     return webutils.identify_crate(crate_id)
 
 @frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
+def get_crate_history(crate_id: str, include_archive: int = 1):
+    """
+    Returns every activity of a crate, including those moved to the archive.
+    """
+    frappe.has_permission("Crate Activity", throw=True)
+    return archive.get_crate_history(crate_id, frappe.utils.cint(include_archive))
+
+
+@frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
+def get_crate_genealogy(crate_id: str):
+    """
+    Returns the crates a crate or package was split or picked from, back to the procured crate,
+    and every crate and package derived from it. A bare crate ID means the crate's current cycle.
+    """
+    frappe.has_permission("Crate Genealogy", throw=True)
+    return genealogy.get_genealogy(crate_id)
+
+
+@frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
+def get_batch_recall(batch_id: str):
+    """
+    Returns every crate labelled under a batch, where it is now, and the crates and packages made from it.
+    """
+    frappe.has_permission("GoDesi Batch Crate", throw=True)
+    return recalls.get_batch_recall(batch_id)
+
+
+@frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
+def get_throughput(
+    from_date: str, to_date: str, period: str = "Daily", warehouse: str | None = None, activity: str | None = None
+):
+    """
+    Crates, weight, moisture loss and actual loss per warehouse and activity, for dashboards.
+    Served from the hourly and daily rollups.
+    """
+    frappe.has_permission(rollups.DAILY, throw=True)
+    return rollups.get_throughput(from_date, to_date, period, warehouse, activity)
+
+
+@frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
+def export_crates_csv(session_id: str | None = None, reference_id: str | None = None):
+    """
+    Streams the crates of a session, or of a transfer by its reference_id, as CSV.
+    """
+    filename, rows = exports.export_crates_csv(session_id, reference_id)
+    response = Response(rows, mimetype="text/csv")
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    # Let nginx pass chunks through as they are written instead of buffering the whole export
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
 def get_new_activity_session(activity: str):
     context = webutils.activity_requirements[activity]
     context["session_id"] = workflows.get_new_activity_session(activity)
@@ -71,11 +200,13 @@ def get_new_activity_session(activity: str):
 
 
 @frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
 def update_activity_session(session_id: str, context: str):
     return workflows.update_activity_session(session_id, context)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrumentation.instrument
 def get_session_context(activity: str):
     return webutils.get_activity_context(activity)
 
@@ -89,23 +220,36 @@ def get_id_token():
 
 
 def get_user_from_id_token():
-    id_token = get_id_token()
-    return admin.get_frappe_user_from_id_token(id_token)
+    if not firebase_auth.is_configured():
+        # firebase_admin and its google-auth dependencies are only loaded for firebase logins
+        from iotready_firebase import admin
+
+        return admin.get_frappe_user_from_id_token(get_id_token())
+    return firebase_auth.get_user_from_token(get_id_token())
 
 
 @frappe.whitelist(allow_guest=True)
+@instrumentation.instrument
 def login_with_firebase_token(token):
     if not token:
         frappe.throw(frappe._("Unauthorized"), frappe.AuthenticationError)
-
-    username = admin.log_into_frappe_with_id_token(token)
+    username = firebase_auth.login(token)
     if not username or username == 'Guest':
         frappe.throw(frappe._("Unauthorized"), frappe.AuthenticationError)
     return username
 
 
 @frappe.whitelist(allow_guest=True)
+@instrumentation.instrument
 def get_configuration_with_firebase_token(token):
     login_with_firebase_token(token)
     return get_configuration()
 
+
+@frappe.whitelist(allow_guest=False)
+def get_instrumentation_stats():
+    """
+    Per-method timings recorded by this worker when godesi_instrumentation is enabled.
+    """
+    frappe.only_for("System Manager")
+    return instrumentation.get_stats()
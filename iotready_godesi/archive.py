@@ -0,0 +1,169 @@
+import frappe
+import time
+from datetime import timedelta
+from frappe.utils import now_datetime
+from iotready_godesi import replica
+
+# `tabCrate Activity` only keeps the working set. Completed activities that belong to an earlier
+# crate cycle (i.e. before the crate's latest Procurement / Crate Splitting) and are older than
+# the configured horizon are moved here. crate_activities never reads those rows, so hot reads
+# are unchanged while the full history stays available through get_crate_history.
+ARCHIVE_TABLE = "tabCrate Activity Archive"
+HOT_TABLE = "tabCrate Activity"
+# crate_activities always reads the last 7 days, so never archive anything newer
+MIN_ARCHIVE_AFTER_DAYS = 7
+MAX_BATCHES_PER_RUN = 200
+BATCH_PAUSE_SECONDS = 0.5
+
+
+def get_archive_settings():
+    archive_after_days = frappe.db.get_single_value("Go Desi Settings", "archive_after_days") or 90
+    batch_size = frappe.db.get_single_value("Go Desi Settings", "archive_batch_size") or 5000
+    return max(archive_after_days, MIN_ARCHIVE_AFTER_DAYS), batch_size
+
+
+def get_columns(table):
+    sql = """
+    SELECT COLUMN_NAME, COLUMN_TYPE
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    ORDER BY ORDINAL_POSITION
+    """
+    return frappe.db.sql(sql, table)
+
+
+def ensure_archive_table():
+    """
+    Creates the archive as a clone of the hot table, adds any columns added to Crate Activity since
+    and gives columns whose type changed the hot table's type, so every row copies without loss.
+    """
+    frappe.db.sql_ddl(f"CREATE TABLE IF NOT EXISTS `{ARCHIVE_TABLE}` LIKE `{HOT_TABLE}`")
+    archived = dict(get_columns(ARCHIVE_TABLE))
+    for column, column_type in get_columns(HOT_TABLE):
+        if column not in archived:
+            frappe.db.sql_ddl(
+                f"ALTER TABLE `{ARCHIVE_TABLE}` ADD COLUMN `{column}` {column_type} NULL"
+            )
+        elif archived[column] != column_type:
+            frappe.db.sql_ddl(
+                f"ALTER TABLE `{ARCHIVE_TABLE}` MODIFY COLUMN `{column}` {column_type} NULL"
+            )
+    return [row[0] for row in get_columns(HOT_TABLE)]
+
+
+def get_archivable_activities(cutoff, batch_size, after):
+    """
+    Returns (names, last key) for the next page of Completed activities older than `cutoff`, after the
+    (modified, name) key `after`, keeping those that precede their crate's latest cycle start.
+    Cycle starts are only looked up for the crates on the page.
+    """
+    sql = f"""
+    SELECT name, crate_id, modified
+    FROM `{HOT_TABLE}`
+    WHERE status = 'Completed'
+        AND modified < %(cutoff)s
+        AND (modified > %(modified)s OR (modified = %(modified)s AND name > %(name)s))
+    ORDER BY modified ASC, name ASC
+    LIMIT %(batch_size)s
+    """
+    values = {"cutoff": cutoff, "modified": after[0], "name": after[1], "batch_size": batch_size}
+    candidates = frappe.db.sql(sql, values, as_dict=True)
+    if not candidates:
+        return [], after
+    cycle_starts = dict(
+        frappe.db.sql(
+            f"""
+            SELECT crate_id, MAX(modified)
+            FROM `{HOT_TABLE}`
+            WHERE activity IN ('Procurement', 'Crate Splitting') AND crate_id IN %(crate_ids)s
+            GROUP BY crate_id
+            """,
+            {"crate_ids": list({row.crate_id for row in candidates})},
+        )
+    )
+    names = [
+        row.name
+        for row in candidates
+        if cycle_starts.get(row.crate_id) and row.modified < cycle_starts[row.crate_id]
+    ]
+    return names, (candidates[-1].modified, candidates[-1].name)
+
+
+def count_archived_copies(columns, names):
+    """
+    How many of `names` are in the archive with every column equal to the hot row.
+    """
+    matches = " AND ".join(f"a.`{column}` <=> h.`{column}`" for column in columns)
+    sql = f"""
+    SELECT COUNT(*)
+    FROM `{HOT_TABLE}` h
+    JOIN `{ARCHIVE_TABLE}` a ON a.name = h.name AND {matches}
+    WHERE h.name IN %(names)s
+    """
+    return frappe.db.sql(sql, {"names": names})[0][0]
+
+
+def archive_crate_activities():
+    """
+    Scheduled mover. Copies and deletes in bounded batches, committing after each one,
+    so locks on the hot table are short-lived. Rows are only deleted once every one of them is
+    confirmed in the archive unchanged; otherwise the batch is rolled back and the run stops.
+    """
+    archive_after_days, batch_size = get_archive_settings()
+    cutoff = now_datetime() - timedelta(days=archive_after_days)
+    column_names = ensure_archive_table()
+    columns = ", ".join([f"`{c}`" for c in column_names])
+    moved = 0
+    after = ("1970-01-01", "")
+    for _ in range(MAX_BATCHES_PER_RUN):
+        names, next_after = get_archivable_activities(cutoff, batch_size, after)
+        if next_after == after:
+            break
+        after = next_after
+        if not names:
+            # A page of activities that are all still in their crate's current cycle
+            continue
+        frappe.db.sql(
+            f"""
+            INSERT INTO `{ARCHIVE_TABLE}` ({columns})
+            SELECT {columns} FROM `{HOT_TABLE}` WHERE name IN %(names)s
+            """,
+            {"names": names},
+        )
+        copied = count_archived_copies(column_names, names)
+        if copied != len(names):
+            frappe.db.rollback()
+            frappe.logger("iotready_godesi").error(
+                f"Archive stopped: only {copied} of {len(names)} crate activities were copied intact, none were deleted"
+            )
+            break
+        frappe.db.sql(f"DELETE FROM `{HOT_TABLE}` WHERE name IN %(names)s", {"names": names})
+        frappe.db.commit()
+        moved += len(names)
+        time.sleep(BATCH_PAUSE_SECONDS)
+    frappe.logger("iotready_godesi").info(f"Archived {moved} crate activities older than {cutoff}")
+    return moved
+
+
+def archive_exists():
+    return frappe.db.sql("SHOW TABLES LIKE %s", ARCHIVE_TABLE)
+
+
+@replica.read_only
+def get_crate_history(crate_id, include_archive=True):
+    """
+    Full traceability history for a crate, across the hot table and the archive.
+    """
+    columns = ", ".join([f"`{row[0]}`" for row in get_columns(HOT_TABLE)])
+    sql = f"""
+    SELECT {columns}, 0 AS is_archived FROM `{HOT_TABLE}` WHERE crate_id = %(crate_id)s
+    """
+    if include_archive and archive_exists():
+        sql += f"""
+    UNION ALL
+    SELECT {columns}, 1 AS is_archived FROM `{ARCHIVE_TABLE}` WHERE crate_id = %(crate_id)s
+        """
+    sql += """
+    ORDER BY modified ASC
+    """
+    return frappe.db.sql(sql, {"crate_id": crate_id}, as_dict=True)
@@ -0,0 +1,101 @@
+"""
+Import-time profile of the app's entry points, measured with `python -X importtime` in a fresh interpreter.
+frappe is imported first, since every worker has it loaded before it touches the app.
+
+    bench execute iotready_godesi.benchmarks.imports.run
+    bench execute iotready_godesi.benchmarks.imports.run --kwargs "{'save_profile': True}"
+
+Saving writes import_profile.json next to this file: the median of `repeat` cold imports per entry point
+and the budget test_import_time enforces, the median plus IMPORT_HEADROOM. Commit it with the numbers
+in the commit message.
+"""
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = [
+    "iotready_godesi.hooks",
+    "iotready_godesi.api",
+    "iotready_godesi.webutils",
+    "iotready_godesi.doc_hooks",
+    "iotready_godesi.manifests",
+]
+PRELOADED = ["frappe"]
+# Budgets allow this much over the measured median, for noise between runs and machines
+IMPORT_HEADROOM = 0.5
+PROFILE_PATH = os.path.join(os.path.dirname(__file__), "import_profile.json")
+
+
+def parse_importtime(output):
+    """
+    Rows of (name, depth, self_us, cumulative_us) in the order Python reports them: children before parents.
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile_import(module, preloaded=PRELOADED):
+    code = "; ".join([f"import {m}" for m in preloaded + [module]])
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = parse_importtime(result.stderr)
+    top_level = [i for i, row in enumerate(rows) if row[1] == 0]
+    # The entry point is the last top-level import; its block starts after the previous one
+    end = top_level[-1]
+    start = top_level[-2] + 1 if len(top_level) > 1 else 0
+    block = rows[start : end + 1]
+    return {
+        "module": module,
+        "total_ms": rows[end][3] / 1000,
+        "modules": [row[0] for row in block],
+        "slowest": [
+            {"module": row[0], "self_ms": row[2] / 1000}
+            for row in sorted(block, key=lambda row: row[2], reverse=True)[:15]
+        ],
+    }
+
+
+def load_profile():
+    if not os.path.exists(PROFILE_PATH):
+        return {}
+    with open(PROFILE_PATH) as f:
+        return json.load(f)
+
+
+def run(repeat=5, save_profile=False):
+    profiles = []
+    measured = {}
+    for module in ENTRY_POINTS:
+        runs = [profile_import(module) for _ in range(repeat)]
+        measured[module] = statistics.median(profile["total_ms"] for profile in runs)
+        profiles.append(runs[-1])
+        print(f"{module:<40}{measured[module]:>10.1f}ms{len(runs[-1]['modules']):>6} modules")
+        for row in runs[-1]["slowest"]:
+            print(f"    {row['module']:<60}{row['self_ms']:>10.1f}ms")
+    if save_profile:
+        profile = {
+            "python": platform.python_version(),
+            "repeat": repeat,
+            "headroom": IMPORT_HEADROOM,
+            "entry_points": {
+                module: {"median_ms": round(median_ms, 1), "budget_ms": math.ceil(median_ms * (1 + IMPORT_HEADROOM))}
+                for module, median_ms in measured.items()
+            },
+        }
+        with open(PROFILE_PATH, "w") as f:
+            json.dump(profile, f, indent=1, sort_keys=True)
+    return profiles
@@ -0,0 +1,300 @@
+"""
+Micro-benchmarks for the Crate Activity query functions in webutils and validations.
+
+Seeds `tabCrate Activity` with synthetic crate lifecycles, times each function, captures the
+EXPLAIN plan of every query it issues and compares the timings against a stored baseline.
+Only run this on a benchmark or development site:
+
+    bench --site bench.localhost execute iotready_godesi.benchmarks.queries.run --kwargs "{'rows': 100000}"
+    bench --site bench.localhost execute iotready_godesi.benchmarks.queries.run --kwargs "{'rows': 100000, 'save_baseline': True}"
+    bench --site bench.localhost execute iotready_godesi.benchmarks.queries.cleanup
+"""
+import json
+import os
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import frappe
+from iotready_godesi import validations, webutils
+
+PREFIX = "BENCH-"
+INSERT_BATCH_SIZE = 5000
+# A crate lifecycle is Procurement -> Transfer Out -> Transfer In -> Customer Picking.
+# Crates starting on the same day share a session per activity and a transfer reference, rolling over
+# to a new session and reference every CRATES_PER_SESSION crates, about what one handheld scans in a shift.
+ACTIVITIES_PER_CRATE = 4
+CRATES_PER_SESSION = 200
+WAREHOUSES = ["BENCH-WH-A", "BENCH-WH-B", "BENCH-WH-C"]
+ITEMS = [f"BENCH-ITEM-{i}" for i in range(20)]
+# A regression is flagged when the median is this much slower than the baseline
+REGRESSION_TOLERANCE = 0.25
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+ACTIVITY_COLUMNS = [
+    "name",
+    "creation",
+    "modified",
+    "owner",
+    "modified_by",
+    "docstatus",
+    "crate_id",
+    "activity",
+    "status",
+    "session_id",
+    "reference_id",
+    "linked_reference_id",
+    "source_warehouse",
+    "target_warehouse",
+    "item_code",
+    "item_name",
+    "stock_uom",
+    "grn_quantity",
+    "crate_weight",
+    "moisture_loss",
+    "actual_loss",
+    "last_known_grn_quantity",
+    "last_known_crate_weight",
+    "picked_quantity",
+]
+
+
+def insert_rows(table, columns, rows):
+    column_list = ", ".join([f"`{c}`" for c in columns])
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        batch = rows[i : i + INSERT_BATCH_SIZE]
+        values = [v for row in batch for v in row]
+        frappe.db.sql(
+            f"INSERT INTO `{table}` ({column_list}) VALUES {', '.join([placeholders] * len(batch))}",
+            values,
+        )
+        frappe.db.commit()
+
+
+def get_session_id(activity, day, index):
+    return f"{PREFIX}{activity[:2].upper()}-{day:%Y%m%d}-{index:03d}"
+
+
+def generate_crate_lifecycle(rng, crate_id, start, session_index):
+    """
+    Rows for one crate. Sessions and transfer references are shared by many crates,
+    as they are in production.
+    """
+    item_code = rng.choice(ITEMS)
+    stock_uom = rng.choice(["Nos", "Kg"])
+    quantity = rng.randint(10, 40)
+    weight = round(quantity * rng.uniform(0.9, 1.1) + 1, 2)
+    source, target = rng.sample(WAREHOUSES, 2)
+    transfer_reference = f"{PREFIX}TO-{start.date():%Y%m%d}-{session_index:03d}"
+    steps = [
+        ("Procurement", None, None, 0),
+        ("Transfer Out", transfer_reference, None, 0),
+        ("Transfer In", None, transfer_reference, round(rng.uniform(0, 0.5), 2)),
+        ("Customer Picking", None, None, 0),
+    ]
+    rows = []
+    for i, (activity, reference_id, linked_reference_id, loss) in enumerate(steps):
+        timestamp = start + timedelta(hours=6 * i, seconds=rng.randint(0, 3600))
+        rows.append(
+            (
+                f"{crate_id}-{i}",
+                timestamp,
+                timestamp,
+                "Administrator",
+                "Administrator",
+                0,
+                crate_id,
+                activity,
+                "Completed",
+                get_session_id(activity, start.date(), session_index),
+                reference_id,
+                linked_reference_id,
+                source,
+                target,
+                item_code,
+                item_code,
+                stock_uom,
+                quantity,
+                weight,
+                loss,
+                loss,
+                quantity,
+                weight,
+                quantity if activity == "Customer Picking" else 0,
+            )
+        )
+    return rows
+
+
+def seed(rows=10000, days=90, seed_value=42):
+    """
+    Inserts roughly `rows` synthetic activities spread over the last `days` days.
+    """
+    rng = random.Random(seed_value)
+    crate_count = max(1, rows // ACTIVITIES_PER_CRATE)
+    now = datetime.now()
+    first_day = (now - timedelta(days=days)).date()
+    dates = [first_day + timedelta(days=d) for d in range(days + 1)]
+    crates_per_day = {}
+    activity_rows = []
+    crate_rows = []
+    for n in range(crate_count):
+        crate_id = f"{PREFIX}{str(n).zfill(8)}"
+        start = datetime.combine(rng.choice(dates[:-1]), datetime.min.time()) + timedelta(hours=rng.randint(0, 12))
+        session_index = crates_per_day.get(start.date(), 0) // CRATES_PER_SESSION
+        crates_per_day[start.date()] = crates_per_day.get(start.date(), 0) + 1
+        activity_rows += generate_crate_lifecycle(rng, crate_id, start, session_index)
+        crate_rows.append((crate_id, crate_id, start, start, "Administrator", "Administrator", 0, start))
+        if len(activity_rows) >= INSERT_BATCH_SIZE * 10:
+            insert_rows("tabCrate Activity", ACTIVITY_COLUMNS, activity_rows)
+            activity_rows = []
+    insert_rows("tabCrate Activity", ACTIVITY_COLUMNS, activity_rows)
+    insert_rows(
+        "tabCrate",
+        ["name", "id", "creation", "modified", "owner", "modified_by", "docstatus", "procurement_timestamp"],
+        crate_rows,
+    )
+    return crate_count
+
+
+def cleanup():
+    for table in ["tabCrate Activity", "tabCrate", "tabTransfer Manifest"]:
+        frappe.db.sql(f"DELETE FROM `{table}` WHERE name LIKE %s", f"{PREFIX}%")
+    frappe.db.commit()
+
+
+@contextmanager
+def capture_queries():
+    """
+    Records every query issued through frappe.db.sql while active.
+    """
+    queries = []
+    original_sql = frappe.db.sql
+
+    def sql(query, values=(), *args, **kwargs):
+        queries.append((query, values))
+        return original_sql(query, values, *args, **kwargs)
+
+    frappe.db.sql = sql
+    try:
+        yield queries
+    finally:
+        frappe.db.sql = original_sql
+
+
+def explain(queries):
+    plans = []
+    for query, values in queries:
+        statement = query.strip()
+        if not statement.upper().startswith(("SELECT", "WITH")):
+            continue
+        plans.append(
+            {
+                "query": " ".join(statement.split()),
+                "plan": frappe.db.sql(f"EXPLAIN {statement}", values, as_dict=True),
+            }
+        )
+    return plans
+
+
+def get_samples():
+    crate_id = frappe.db.sql(
+        "SELECT crate_id FROM `tabCrate Activity` WHERE name LIKE %s ORDER BY modified DESC LIMIT 1",
+        f"{PREFIX}%",
+    )[0][0]
+    latest = frappe.db.sql(
+        """
+        SELECT session_id, activity, target_warehouse, reference_id, linked_reference_id
+        FROM `tabCrate Activity`
+        WHERE crate_id = %s
+        """,
+        crate_id,
+        as_dict=True,
+    )
+    by_activity = {row["activity"]: row for row in latest}
+    return crate_id, by_activity
+
+
+def get_cases():
+    crate_id, by_activity = get_samples()
+    procurement_session = by_activity["Procurement"]["session_id"]
+    transfer_in_session = by_activity["Transfer In"]["session_id"]
+    target_warehouse = by_activity["Transfer Out"]["target_warehouse"]
+    return {
+        "crate_activities": lambda: webutils.crate_activities(crate_id),
+        "get_crates": lambda: webutils.get_crates(procurement_session, completed=True),
+        "get_session_item_summary": lambda: webutils.get_session_item_summary(procurement_session, "Procurement"),
+        "get_session_crate_summary": lambda: webutils.get_session_crate_summary(procurement_session, "Procurement"),
+        "get_session_crate_summary_transfer_in": lambda: webutils.get_session_crate_summary(
+            transfer_in_session, "Transfer In"
+        ),
+        "validate_submitted_transfer_out_v2": lambda: validations.validate_submitted_transfer_out_v2(
+            crate_id, target_warehouse
+        ),
+    }
+
+
+def time_case(fn, repeat):
+    # The first call warms caches and lazily built rows (e.g. Transfer Manifests)
+    with capture_queries() as queries:
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+        "queries": len(queries),
+        "explain": explain(queries),
+    }
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def compare(results, baseline):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        result["baseline_median_ms"] = reference["median_ms"]
+        if result["median_ms"] > reference["median_ms"] * (1 + REGRESSION_TOLERANCE):
+            regressions.append(name)
+    return regressions
+
+
+def run(rows=None, repeat=20, save_baseline=False):
+    """
+    Seeds `rows` synthetic activities when given, then benchmarks every case.
+    Baselines are stored per table size, so a 10k run is never compared against a 10M run.
+    """
+    if rows:
+        cleanup()
+        seed(rows)
+    table_rows = frappe.db.sql("SELECT COUNT(*) FROM `tabCrate Activity`")[0][0]
+    size_key = str(10 ** len(str(table_rows)) // 10)
+    results = {name: time_case(fn, repeat) for name, fn in get_cases().items()}
+    baseline = load_baseline()
+    regressions = compare(results, baseline.get(size_key, {}))
+    for name, result in results.items():
+        flag = "REGRESSION" if name in regressions else ""
+        print(f"{name:<45}{result['median_ms']:>10.2f}ms{result['queries']:>5} queries  {flag}")
+    if save_baseline:
+        baseline[size_key] = {
+            name: {"median_ms": result["median_ms"], "queries": result["queries"]}
+            for name, result in results.items()
+        }
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+    return {"table_rows": table_rows, "results": results, "regressions": regressions}
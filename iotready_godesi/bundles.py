@@ -0,0 +1,89 @@
+import frappe
+import hashlib
+import json
+from iotready_godesi import utils, validations
+
+# Bump when the bundle layout changes so that older apps can refuse a bundle they cannot read
+BUNDLE_VERSION = 1
+BUNDLE_CACHE_KEY = "godesi:validation_bundle"
+
+
+def get_item_rules(item_codes):
+    """
+    Weight rules per item. Handhelds compute the band for any quantity as
+    (unit_weight * quantity + packaging_weight) * (1 - lower_tolerance / 100) .. (1 + upper_tolerance / 100),
+    the same formula as validations.get_procurement_weight_band.
+    """
+    if not item_codes:
+        return {}
+    items = frappe.get_all(
+        "Item",
+        filters={"name": ["in", item_codes], "disabled": 0},
+        fields=[
+            "name",
+            "stock_uom",
+            "secondary_box_weight",
+            "tertiary_packaging_weight",
+            "tertiary_package_quantity",
+            "lower_tolerance",
+            "upper_tolerance",
+        ],
+    )
+    rules = {}
+    for item in items:
+        standard_quantity = item.tertiary_package_quantity or 0
+        lower_limit, upper_limit = validations.get_procurement_weight_band(item, standard_quantity)
+        rules[item.name] = {
+            "stock_uom": "Nos" if item.stock_uom.lower() in ["nos", "pcs"] else item.stock_uom,
+            "unit_weight": item.secondary_box_weight,
+            "packaging_weight": item.tertiary_packaging_weight,
+            "lower_tolerance": item.lower_tolerance,
+            "upper_tolerance": item.upper_tolerance,
+            "transfer_in_tolerance": validations.get_transfer_in_tolerance(item),
+            "standard_quantity": standard_quantity,
+            "standard_weight_band": [round(lower_limit, 3), round(upper_limit, 3)],
+        }
+    return rules
+
+
+def build_validation_bundle(warehouse):
+    warehouse_doc = frappe.get_doc("Warehouse", warehouse)
+    supplier_ids = [row.supplier for row in warehouse_doc.supplier_table]
+    suppliers = []
+    if supplier_ids:
+        suppliers = frappe.get_all(
+            "Supplier", filters={"name": ["in", supplier_ids], "disabled": 0}, pluck="name", order_by="name"
+        )
+    bundle = {
+        "version": BUNDLE_VERSION,
+        "warehouse": warehouse,
+        "items": get_item_rules([row.item_code for row in warehouse_doc.item_table]),
+        "destinations": sorted({row.warehouse for row in warehouse_doc.destination_table}),
+        "vehicles": frappe.get_all("Vehicle", pluck="name", order_by="name"),
+        "suppliers": suppliers,
+    }
+    content = json.dumps(bundle, sort_keys=True, separators=(",", ":"), default=str)
+    bundle["hash"] = hashlib.sha256(content.encode()).hexdigest()[:16]
+    return bundle
+
+
+def get_validation_bundle(known_hash=None):
+    """
+    Weight bands, destinations, vehicles and suppliers for the user's warehouse, so the handheld can reject
+    obviously bad scans without a round trip. The server still validates every event.
+    Returns only {"hash", "unchanged"} when the app already holds the current bundle.
+    """
+    warehouse = utils.get_user_warehouse()
+    cache = frappe.cache()
+    bundle = cache.hget(BUNDLE_CACHE_KEY, warehouse)
+    if not bundle:
+        bundle = build_validation_bundle(warehouse)
+        cache.hset(BUNDLE_CACHE_KEY, warehouse, bundle)
+    if known_hash and known_hash == bundle["hash"]:
+        return {"hash": bundle["hash"], "unchanged": True}
+    return bundle
+
+
+def clear_validation_bundles(doc=None, event=None):
+    # Items and vehicles are shared by all warehouses, so every bundle is dropped
+    frappe.cache().delete_key(BUNDLE_CACHE_KEY)
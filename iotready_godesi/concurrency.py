@@ -0,0 +1,33 @@
+import frappe
+
+# Two handhelds scanning the same crate at the same moment both pass validation against the same state.
+# Each scan reads the crate's version before validating and claims the crate with a compare-and-swap
+# just before writing its activity; only the first claim matches, the other scan is rejected.
+CONFLICT_MESSAGE = "Crate is being scanned on another device. Please scan again."
+
+
+class CrateConflictError(frappe.ValidationError):
+    pass
+
+
+def get_crate_version(crate_id):
+    return frappe.utils.cint(frappe.db.get_value("Crate", crate_id, "godesi_version"))
+
+
+def claim_crate(crate_id, version):
+    """
+    Moves the crate from `version` to the next one. Raises CrateConflictError when another scan
+    got there first. The row lock is held until the request commits, so a concurrent claim waits
+    and then finds the version has moved.
+    """
+    frappe.db.sql(
+        """
+        UPDATE `tabCrate`
+        SET godesi_version = IFNULL(godesi_version, 0) + 1
+        WHERE name = %(crate_id)s AND IFNULL(godesi_version, 0) = %(version)s
+        """,
+        {"crate_id": crate_id, "version": version},
+    )
+    if not frappe.db._cursor.rowcount:
+        frappe.throw(CONFLICT_MESSAGE, CrateConflictError)
+    return version + 1
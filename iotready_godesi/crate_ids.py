@@ -0,0 +1,123 @@
+import frappe
+from frappe.utils import add_days, now_datetime
+
+CRATE_ID_BLOCK = "Crate ID Block"
+# A device may ask for at most this many IDs at once
+MAX_BLOCK_SIZE = 1000
+
+
+def get_settings():
+    settings = frappe.get_cached_doc("Go Desi Settings")
+    return {
+        "prefix": settings.crate_id_prefix or "GDB",
+        "digits": settings.crate_id_digits or 8,
+        "block_size": settings.crate_id_block_size or 100,
+        "block_days": settings.crate_id_block_days or 7,
+    }
+
+
+def format_crate_id(prefix, digits, number):
+    return f"{prefix}{str(number).zfill(digits)}"
+
+
+def allocate_range(prefix, size):
+    """
+    Moves the `tabSeries` counter for `prefix` forward by `size` and returns the first and last number.
+    The row lock is held until the request commits, so concurrent reservations never overlap.
+    """
+    series = f"godesi-crate-{prefix}"
+    frappe.db.sql("INSERT IGNORE INTO `tabSeries` (`name`, `current`) VALUES (%s, 0)", series)
+    current = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", series)[0][0]
+    frappe.db.sql("UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name` = %s", (size, series))
+    return current + 1, current + size
+
+
+def reserve_block(size=None, device_id=None):
+    """
+    Reserves a contiguous range of crate IDs for the current user. The device assigns them locally;
+    each ID becomes a Crate the first time it is scanned.
+    """
+    settings = get_settings()
+    size = frappe.utils.cint(size) or settings["block_size"]
+    assert 0 < size <= MAX_BLOCK_SIZE, f"Block size must be between 1 and {MAX_BLOCK_SIZE}."
+    first_number, last_number = allocate_range(settings["prefix"], size)
+    doc = frappe.new_doc(CRATE_ID_BLOCK)
+    doc.update(
+        {
+            "status": "Reserved",
+            "user": frappe.session.user,
+            "device_id": device_id,
+            "expires_at": add_days(now_datetime(), settings["block_days"]),
+            "prefix": settings["prefix"],
+            "digits": settings["digits"],
+            "first_number": first_number,
+            "last_number": last_number,
+            "first_crate_id": format_crate_id(settings["prefix"], settings["digits"], first_number),
+            "last_crate_id": format_crate_id(settings["prefix"], settings["digits"], last_number),
+            "used_count": 0,
+        }
+    )
+    doc.insert(ignore_permissions=True)
+    return {
+        "block": doc.name,
+        "prefix": doc.prefix,
+        "digits": doc.digits,
+        "first_number": doc.first_number,
+        "last_number": doc.last_number,
+        "first_crate_id": doc.first_crate_id,
+        "last_crate_id": doc.last_crate_id,
+        "expires_at": doc.expires_at,
+    }
+
+
+def get_block_crate_ids(block):
+    return [
+        format_crate_id(block["prefix"], block["digits"], number)
+        for number in range(block["first_number"], block["last_number"] + 1)
+    ]
+
+
+def parse_crate_id(crate_id):
+    settings = get_settings()
+    prefix = settings["prefix"]
+    number = crate_id[len(prefix) :]
+    if not crate_id.startswith(prefix) or not number.isdigit():
+        return None, None
+    return prefix, int(number)
+
+
+def crate_after_insert(doc, event=None):
+    """
+    Counts a reserved ID as used when its Crate is created. A block is Used once every ID in it is.
+    """
+    prefix, number = parse_crate_id(doc.name)
+    if number is None:
+        return
+    # Assignments are evaluated left to right, so the status check sees the incremented count
+    frappe.db.sql(
+        """
+        UPDATE `tabCrate ID Block`
+        SET used_count = used_count + 1,
+            status = IF(used_count >= last_number - first_number + 1, 'Used', status)
+        WHERE prefix = %(prefix)s
+            AND first_number <= %(number)s
+            AND last_number >= %(number)s
+            AND status != 'Used'
+        """,
+        {"prefix": prefix, "number": number},
+    )
+
+
+def expire_crate_id_blocks():
+    """
+    Scheduled. Marks reserved blocks past their validity as Expired. Their unused IDs are never handed out again.
+    """
+    frappe.db.sql(
+        """
+        UPDATE `tabCrate ID Block`
+        SET status = 'Expired'
+        WHERE status = 'Reserved' AND expires_at < %s
+        """,
+        now_datetime(),
+    )
+    frappe.db.commit()
@@ -1,7 +1,12 @@
 import frappe
 import json
 import re
-from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+from functools import lru_cache
+
+# Rendered summary tables are keyed by `modified`, so this only bounds memory use
+SUMMARY_CACHE_TTL = 24 * 60 * 60
+CRATE_TABLE_PAGE_LENGTH = 100
+CRATE_ACTIVITY_SUMMARY = "Crate Activity Summary"
 
 
 def ensure_unique_user(doc):
@@ -25,6 +30,14 @@ def warehouse_before_save(doc, event=None):
     ensure_unique_user(doc)
 
 
+def make_stock_entry(**args):
+    # Imported on use: erpnext's stock entry module pulls in most of the stock controllers,
+    # which the summary renderers and the scan API never need
+    from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+
+    return make_stock_entry(**args)
+
+
 def create_consumption_stock_entry(
     items, warehouse, use_multi_level_bom=False, submit=False, crate_activity_summary_ref=None
 ):
@@ -214,6 +227,7 @@ def transfer_in_submit_hook(crate_activity_summary_doc):
     )
 
 
+@lru_cache(maxsize=None)
 def parse_tax_rate(s):
     # Use a regular expression to search for a number followed by a percentage sign
     match = re.search(r"(\d+(\.\d+)?)%", s)
@@ -227,31 +241,75 @@ def parse_tax_rate(s):
     return 0
 
 
+def get_cached_render(key, crate_activity_summary_doc):
+    """
+    Rendered summary fragments are cached against the summary's `modified` timestamp.
+    Any edit to the summary bumps `modified`, so stale entries are never served.
+    """
+    cache_key = f"godesi:{key}:{crate_activity_summary_doc.name}:{crate_activity_summary_doc.modified}"
+    return cache_key, frappe.cache().get_value(cache_key)
+
+
+def get_item_details(item_codes, price_list):
+    """
+    Resolves HSN codes, price list rates and tax rates for all items in bulk.
+    """
+    details = {
+        item_code: {"gst_hsn_code": "", "tax_rate": 0, "price_list_rate": 0}
+        for item_code in item_codes
+    }
+    if not details:
+        return details
+    # gst_hsn_code is a custom field from India Compliance; sites without it get empty codes
+    fields = ["name"]
+    if frappe.get_meta("Item").has_field("gst_hsn_code"):
+        fields.append("gst_hsn_code")
+    items = frappe.get_all(
+        "Item",
+        filters={"name": ["in", item_codes]},
+        fields=fields,
+    )
+    for row in items:
+        details[row["name"]]["gst_hsn_code"] = row.get("gst_hsn_code") or ""
+    # Item Price has no uniqueness guarantee, the first match wins as before
+    prices = frappe.get_all(
+        "Item Price",
+        filters={"item_code": ["in", item_codes], "price_list": price_list},
+        fields=["item_code", "price_list_rate"],
+        order_by="modified desc",
+    )
+    for row in reversed(prices):
+        details[row["item_code"]]["price_list_rate"] = row["price_list_rate"]
+    # Only the first tax template of each item is considered
+    taxes = frappe.get_all(
+        "Item Tax",
+        filters={"parenttype": "Item", "parent": ["in", item_codes]},
+        fields=["parent", "item_tax_template"],
+        order_by="idx desc",
+    )
+    for row in taxes:
+        details[row["parent"]]["tax_rate"] = parse_tax_rate(row["item_tax_template"] or "")
+    return details
+
+
 def sku_table_hook(crate_activity_summary_doc):
+    cache_key, html = get_cached_render("sku_table", crate_activity_summary_doc)
+    if html:
+        return html
     items = json.loads(crate_activity_summary_doc.items)
     activity = crate_activity_summary_doc.activity
     total_number_of_crates = sum([row["number_of_crates"] for row in items])
     total_weight = sum([row["crate_weight"] for row in items])
     price_list = frappe.db.get_single_value("Go Desi Settings", "price_list")
+    item_details = get_item_details(
+        list({row["item_code"] for row in items}), price_list
+    )
 
     for row in items:
-        item_doc = frappe.get_doc("Item", row["item_code"])
-        price_list_rates = frappe.get_all(
-            "Item Price",
-            filters={"item_code": row["item_code"], "price_list": price_list},
-            fields=["price_list_rate"],
-        )
-
-        row["gst_hsn_code"] = item_doc.get("gst_hsn_code") or ""
-        row["tax_rate"] = (
-            parse_tax_rate(item_doc.taxes[0].item_tax_template)
-            if len(item_doc.taxes) > 0
-            else 0
-        )
-        if len(price_list_rates) > 0:
-            row["price"] = price_list_rates[0]["price_list_rate"] * row["qty"]
-        else:
-            row["price"] = 0
+        details = item_details[row["item_code"]]
+        row["gst_hsn_code"] = details["gst_hsn_code"]
+        row["tax_rate"] = details["tax_rate"]
+        row["price"] = details["price_list_rate"] * row["qty"]
         row["tax_amount"] = row["price"] * row["tax_rate"]
         row["price_with_tax"] = row["price"] + row["tax_amount"]
     total_price = sum([row["price"] for row in items])
@@ -266,24 +324,65 @@ def sku_table_hook(crate_activity_summary_doc):
         "total_tax_amount": total_tax_amount,
         "total_price_with_tax": total_price_with_tax,
     }
-    return frappe.render_template(
+    html = frappe.render_template(
         "templates/includes/custom_sku_table.html",
         context,
     )
+    frappe.cache().set_value(cache_key, html, expires_in_sec=SUMMARY_CACHE_TTL)
+    return html
 
 
-def crate_table_hook(crate_activity_summary_doc):
+def get_crate_table_context(crate_activity_summary_doc, start=0, page_length=CRATE_TABLE_PAGE_LENGTH):
     crates = json.loads(crate_activity_summary_doc.crates)
-    activity = crate_activity_summary_doc.activity
-    is_editable = False
-    total_crate_weight = sum([row["crate_weight"] for row in crates])
-    context = {
-        "crates": crates,
-        "is_editable": is_editable,
-        "activity": activity,
-        "total_crate_weight": total_crate_weight,
+    next_start = start + page_length
+    return {
+        "crates": crates[start:next_start],
+        "start": start,
+        "next_start": next_start,
+        "has_more": next_start < len(crates),
+        "total_crates": len(crates),
+        "summary_name": crate_activity_summary_doc.name,
+        "is_editable": False,
+        "activity": crate_activity_summary_doc.activity,
+        "total_crate_weight": sum([row["crate_weight"] for row in crates]),
     }
-    return frappe.render_template(
+
+
+def crate_table_hook(crate_activity_summary_doc):
+    """
+    Renders the first page of crates. The rest are fetched on demand through get_crate_table_page.
+    """
+    cache_key, html = get_cached_render("crate_table", crate_activity_summary_doc)
+    if html:
+        return html
+    context = get_crate_table_context(crate_activity_summary_doc)
+    html = frappe.render_template(
         "templates/includes/custom_crate_table.html",
         context,
     )
+    frappe.cache().set_value(cache_key, html, expires_in_sec=SUMMARY_CACHE_TTL)
+    return html
+
+
+def get_crate_table_page(summary_name, start=0):
+    doc = frappe.get_doc(CRATE_ACTIVITY_SUMMARY, summary_name)
+    doc.check_permission("read")
+    try:
+        start = max(int(start), 0)
+    except (TypeError, ValueError):
+        frappe.throw("start must be a whole number.")
+    cache_key, page = get_cached_render(f"crate_table_page:{start}", doc)
+    if page:
+        return page
+    context = get_crate_table_context(doc, start=start)
+    page = {
+        "html": frappe.render_template(
+            "templates/includes/crate_table_rows.html",
+            context,
+        ),
+        "next_start": context["next_start"],
+        "has_more": context["has_more"],
+        "total_crates": context["total_crates"],
+    }
+    frappe.cache().set_value(cache_key, page, expires_in_sec=SUMMARY_CACHE_TTL)
+    return page
@@ -0,0 +1,84 @@
+import frappe
+import time
+from datetime import datetime, timedelta
+from iotready_godesi import manifests
+from iotready_warehouse_traceability_frappe import workflows
+
+# Sessions live in the cache and expire well within a day; drafts are only considered after this
+STALE_DRAFT_HOURS = 24
+BATCH_SIZE = 1000
+MAX_SESSIONS_PER_RUN = 500
+MAX_BATCHES_PER_RUN = 200
+BATCH_PAUSE_SECONDS = 0.2
+
+
+def get_stale_draft_sessions(cutoff, limit):
+    sql = """
+    SELECT session_id
+    FROM `tabCrate Activity`
+    WHERE status = 'Draft' AND modified < %(cutoff)s
+    GROUP BY session_id
+    LIMIT %(limit)s
+    """
+    return [row[0] for row in frappe.db.sql(sql, {"cutoff": cutoff, "limit": limit})]
+
+
+def get_draft_references(session_id, cutoff):
+    sql = """
+    SELECT DISTINCT reference_id, linked_reference_id
+    FROM `tabCrate Activity`
+    WHERE session_id <=> %(session_id)s AND status = 'Draft' AND modified < %(cutoff)s
+    """
+    references = set()
+    for reference_id, linked_reference_id in frappe.db.sql(sql, {"session_id": session_id, "cutoff": cutoff}):
+        references.update([reference_id, linked_reference_id])
+    references.discard(None)
+    references.discard("")
+    return references
+
+
+def get_draft_batch(session_id, cutoff, batch_size):
+    sql = """
+    SELECT name
+    FROM `tabCrate Activity`
+    WHERE session_id <=> %(session_id)s AND status = 'Draft' AND modified < %(cutoff)s
+    LIMIT %(batch_size)s
+    """
+    rows = frappe.db.sql(sql, {"session_id": session_id, "cutoff": cutoff, "batch_size": batch_size})
+    return [row[0] for row in rows]
+
+
+def purge_stale_drafts():
+    """
+    Scheduled. Deletes Draft activities left behind by sessions that have expired, in bounded batches,
+    committing and pausing after each one so locks on the hot table stay short.
+    Transfer Manifests counting the removed rows are refreshed.
+    """
+    cutoff = datetime.now() - timedelta(hours=STALE_DRAFT_HOURS)
+    removed = 0
+    sessions = 0
+    batches = 0
+    for session_id in get_stale_draft_sessions(cutoff, MAX_SESSIONS_PER_RUN):
+        if session_id and workflows.get_activity_session(session_id):
+            continue
+        references = get_draft_references(session_id, cutoff)
+        while batches < MAX_BATCHES_PER_RUN:
+            names = get_draft_batch(session_id, cutoff, BATCH_SIZE)
+            if not names:
+                break
+            frappe.db.sql("DELETE FROM `tabCrate Activity` WHERE name IN %(names)s", {"names": names})
+            frappe.db.commit()
+            removed += len(names)
+            batches += 1
+            time.sleep(BATCH_PAUSE_SECONDS)
+        for reference_id in references:
+            if frappe.db.exists("Transfer Manifest", reference_id):
+                manifests.refresh_transfer_manifest(reference_id)
+        frappe.db.commit()
+        sessions += 1
+        if batches >= MAX_BATCHES_PER_RUN:
+            break
+    frappe.logger("iotready_godesi").info(
+        f"Purged {removed} draft crate activities from {sessions} expired sessions older than {cutoff}"
+    )
+    return {"sessions": sessions, "removed": removed}
@@ -0,0 +1,293 @@
+import csv
+import frappe
+import io
+import os
+import uuid
+from datetime import datetime, timedelta
+from frappe.utils import now_datetime
+from urllib.parse import quote
+from iotready_godesi import archive, genealogy, rollups
+
+# Incremental Parquet export for analytics, so analysts stop pulling full Crate Activity dumps from the desk.
+# Enable with `"godesi_columnar_export": 1` in site_config.json; needs pyarrow installed in the bench env.
+# Files land in private/files/godesi_exports/<dataset>/export_date=<YYYY-MM-DD>/export_warehouse=<warehouse>/,
+# readable with e.g. pyarrow.dataset.dataset(path, partitioning="hive").
+# Exports are append-only: a row modified after it was exported is written again, so readers keep
+# the latest `modified` per `name`.
+# Crate activities are read from the hot table and the archive under one watermark. A row moved to the
+# archive keeps its `modified`, so it is exported once whichever table it was in when the watermark passed it.
+EXPORT_CONFIG_KEY = "godesi_columnar_export"
+EXPORT_FOLDER = "godesi_exports"
+WATERMARK_KEY = "godesi_export_watermark:{dataset}"
+CHUNK_SIZE = 10000
+MAX_ROWS_PER_RUN = 500000
+# CSV rows per chunk handed to the WSGI server by the streaming export
+CSV_ROWS_PER_WRITE = 500
+CSV_COLUMNS = [
+    "crate_id",
+    "activity",
+    "status",
+    "item_code",
+    "item_name",
+    "stock_uom",
+    "supplier_id",
+    "source_warehouse",
+    "target_warehouse",
+    "grn_quantity",
+    "picked_quantity",
+    "crate_weight",
+    "moisture_loss",
+    "actual_loss",
+    "session_id",
+    "reference_id",
+    "linked_reference_id",
+    "owner",
+    "modified",
+]
+
+DATASETS = {
+    "crate_activity": {
+        "table": "tabCrate Activity",
+        "include_archive": True,
+        "date": "DATE(creation)",
+        "warehouse": rollups.WAREHOUSE_SQL,
+        "condition": "status = 'Completed'",
+    },
+    "crate": {
+        "table": "tabCrate",
+        "date": "DATE(modified)",
+        "warehouse": "last_known_warehouse",
+        "condition": "1 = 1",
+    },
+    "daily_throughput": {
+        "table": "tabGo Desi Daily Throughput",
+        "date": "period_start",
+        "warehouse": "warehouse",
+        "condition": "1 = 1",
+    },
+}
+
+
+def get_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        frappe.throw("Columnar export needs pyarrow. Install it with `bench pip install pyarrow`.")
+    return pyarrow
+
+
+def get_arrow_column(pa, column_type):
+    """
+    Arrow type and value converter for a MariaDB column type. Every file of a dataset gets the same schema,
+    even when a chunk only holds NULLs in some column.
+    """
+    column_type = column_type.lower()
+    if column_type.startswith(("int", "bigint", "smallint", "mediumint", "tinyint")):
+        return pa.int64(), None
+    if column_type.startswith(("decimal", "float", "double")):
+        return pa.float64(), float
+    if column_type.startswith(("datetime", "timestamp")):
+        return pa.timestamp("us"), None
+    if column_type == "date":
+        return pa.date32(), None
+    return pa.string(), str
+
+
+def get_watermark(dataset):
+    watermark = frappe.db.get_global(WATERMARK_KEY.format(dataset=dataset))
+    if not watermark:
+        return datetime.min, ""
+    modified, name = watermark.split("|", 1)
+    return frappe.utils.get_datetime(modified), name
+
+
+def set_watermark(dataset, modified, name):
+    frappe.db.set_global(WATERMARK_KEY.format(dataset=dataset), f"{modified}|{name}")
+
+
+def get_partition_path(dataset, date, warehouse):
+    return frappe.get_site_path(
+        "private",
+        "files",
+        EXPORT_FOLDER,
+        dataset,
+        f"export_date={date or 'unknown'}",
+        f"export_warehouse={quote(warehouse or 'unknown', safe='')}",
+    )
+
+
+def write_chunk(pa, schema, converters, dataset, run_id, chunk_number, rows):
+    """
+    Writes one file per partition in the chunk, under a temporary name until the run finishes.
+    """
+    partitions = {}
+    for row in rows:
+        partitions.setdefault((row[-2], row[-1]), []).append(row[:-2])
+    paths = []
+    for (date, warehouse), partition_rows in partitions.items():
+        columns = list(zip(*partition_rows))
+        arrays = []
+        for index, field in enumerate(schema):
+            convert = converters[index]
+            values = columns[index]
+            if convert:
+                values = [None if value is None else convert(value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        folder = get_partition_path(dataset, date, warehouse)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"part-{run_id}-{chunk_number:05d}.parquet.tmp")
+        pa.parquet.write_table(pa.Table.from_arrays(arrays, schema=schema), path)
+        paths.append(path)
+    return paths
+
+
+def export_dataset(dataset):
+    """
+    Exports the rows of `dataset` modified since its watermark, at most MAX_ROWS_PER_RUN of them.
+    Rows are streamed through an unbuffered cursor and written CHUNK_SIZE at a time, so memory stays flat.
+    """
+    pa = get_pyarrow()
+    config = DATASETS[dataset]
+    columns = archive.get_columns(config["table"])
+    schema_columns = [(name, *get_arrow_column(pa, column_type)) for name, column_type in columns]
+    schema = pa.schema([(name, arrow_type) for name, arrow_type, _ in schema_columns])
+    converters = [convert for _, _, convert in schema_columns]
+    modified_index = [name for name, _ in columns].index("modified")
+    name_index = [name for name, _ in columns].index("name")
+
+    watermark_modified, watermark_name = get_watermark(dataset)
+    # Rows modified in the last few minutes may still belong to open transactions
+    until = now_datetime() - timedelta(minutes=rollups.SAFETY_LAG_MINUTES)
+    select = ", ".join(f"`{name}`" for name, _ in columns)
+    tables = genealogy.get_activity_tables() if config.get("include_archive") else [config["table"]]
+    # Each table is read in order on its own index; the merged rows are ordered again
+    sql = " UNION ALL ".join(
+        f"""
+        (SELECT {select}, {config["date"]} AS export_date, {config["warehouse"]} AS export_warehouse
+        FROM `{table}`
+        WHERE {config["condition"]}
+            AND (modified > %(modified)s OR (modified = %(modified)s AND name > %(name)s))
+            AND modified <= %(until)s
+        ORDER BY modified ASC, name ASC
+        LIMIT %(limit)s)
+        """
+        for table in tables
+    )
+    sql += " ORDER BY modified ASC, name ASC LIMIT %(limit)s"
+    values = {"modified": watermark_modified, "name": watermark_name, "until": until, "limit": MAX_ROWS_PER_RUN}
+    run_id = uuid.uuid4().hex[:8]
+    paths = []
+    exported = 0
+    last_row = None
+    try:
+        # No other query may run on this connection until the cursor is drained
+        with frappe.db.unbuffered_cursor():
+            chunk = []
+            for row in frappe.db.sql(sql, values, as_iterator=True):
+                chunk.append(row)
+                if len(chunk) >= CHUNK_SIZE:
+                    paths += write_chunk(pa, schema, converters, dataset, run_id, exported // CHUNK_SIZE, chunk)
+                    exported += len(chunk)
+                    last_row = chunk[-1]
+                    chunk = []
+            if chunk:
+                paths += write_chunk(pa, schema, converters, dataset, run_id, exported // CHUNK_SIZE, chunk)
+                exported += len(chunk)
+                last_row = chunk[-1]
+    except Exception:
+        for path in paths:
+            os.remove(path)
+        raise
+    for path in paths:
+        os.rename(path, path[: -len(".tmp")])
+    if last_row:
+        set_watermark(dataset, last_row[modified_index], last_row[name_index])
+        frappe.db.commit()
+    return exported
+
+
+def export_columnar():
+    """
+    Scheduled. Exports every dataset incrementally when the columnar export is enabled for the site.
+    """
+    if not frappe.conf.get(EXPORT_CONFIG_KEY):
+        return {}
+    exported = {dataset: export_dataset(dataset) for dataset in DATASETS}
+    frappe.logger("iotready_godesi").info(f"Columnar export: {exported}")
+    return exported
+
+
+def get_csv_query(session_id=None, reference_id=None):
+    """
+    Query and values for the crates of a session, or of a transfer (both its Transfer Out and Transfer In rows).
+    """
+    columns = ", ".join(f"`{column}`" for column in CSV_COLUMNS)
+    if session_id:
+        condition = "session_id = %(session_id)s"
+    elif reference_id:
+        condition = "reference_id = %(reference_id)s OR linked_reference_id = %(reference_id)s"
+    else:
+        frappe.throw("Pass a session_id or a reference_id.")
+    sql = f"""
+    SELECT {columns}
+    FROM `tabCrate Activity`
+    WHERE {condition}
+    ORDER BY modified ASC
+    """
+    return sql, {"session_id": session_id, "reference_id": reference_id}
+
+
+def iter_csv(sql, values):
+    """
+    CSV text in chunks of CSV_ROWS_PER_WRITE rows, header first, read through an unbuffered cursor.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    rows = 0
+    with frappe.db.unbuffered_cursor():
+        for row in frappe.db.sql(sql, values, as_iterator=True):
+            writer.writerow(row)
+            rows += 1
+            if rows % CSV_ROWS_PER_WRITE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_csv(site, sql, values):
+    """
+    Generator for a streamed response. The request's connection is closed before the response body
+    is consumed, so the generator opens its own, and puts back whatever the thread had when it is done.
+    """
+    initialised = getattr(frappe.local, "initialised", False)
+    previous_db = getattr(frappe.local, "db", None)
+    if not initialised:
+        frappe.init(site=site)
+    frappe.connect(set_admin_as_user=False)
+    try:
+        yield from iter_csv(sql, values)
+    finally:
+        frappe.db.close()
+        if initialised:
+            frappe.local.db = previous_db
+        else:
+            frappe.destroy()
+
+
+def export_crates_csv(session_id=None, reference_id=None):
+    """
+    Returns (filename, generator) for the crates of a session or transfer. Memory stays flat and the
+    header is sent at once, however many crates there are.
+    """
+    frappe.has_permission("Crate Activity", throw=True)
+    sql, values = get_csv_query(session_id, reference_id)
+    filename = f"crates-{session_id or reference_id}.csv"
+    return filename, stream_csv(frappe.local.site, sql, values)
+
@@ -0,0 +1,145 @@
+import frappe
+import hashlib
+import re
+import time
+from collections import OrderedDict
+
+import jwt
+
+# Firebase ID tokens are verified locally against Google's published signing keys.
+# Set `"firebase_project_id": "<project>"` in site_config.json to enable; without it logins go through iotready_firebase.
+PROJECT_ID_CONFIG_KEY = "firebase_project_id"
+SIGNING_KEYS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+# Used when the key response carries no max-age
+DEFAULT_KEYS_MAX_AGE = 60 * 60
+# Verified tokens per worker; entries also expire with the token
+LOCAL_TOKEN_CACHE_SIZE = 5000
+
+signing_keys = {"keys": {}, "expires_at": 0}
+verified_tokens = OrderedDict()
+
+
+def is_configured():
+    return bool(frappe.conf.get(PROJECT_ID_CONFIG_KEY))
+
+
+def get_max_age(cache_control):
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else DEFAULT_KEYS_MAX_AGE
+
+
+def fetch_signing_keys():
+    """
+    Returns ({kid: PEM certificate}, max_age). Google rotates the keys and announces how long to keep them
+    in the Cache-Control header.
+    """
+    import requests
+
+    response = requests.get(SIGNING_KEYS_URL, timeout=10)
+    response.raise_for_status()
+    return response.json(), get_max_age(response.headers.get("Cache-Control"))
+
+
+def get_signing_keys(fetcher=None):
+    """
+    Public keys by kid, refetched only once the previous response has expired.
+    `fetcher` replaces fetch_signing_keys, e.g. with locally generated keys in tests.
+    """
+    if signing_keys["expires_at"] <= time.time():
+        from cryptography.x509 import load_pem_x509_certificate
+
+        certificates, max_age = (fetcher or fetch_signing_keys)()
+        signing_keys["keys"] = {
+            kid: load_pem_x509_certificate(certificate.encode()).public_key()
+            for kid, certificate in certificates.items()
+        }
+        signing_keys["expires_at"] = time.time() + max_age
+    return signing_keys["keys"]
+
+
+def verify_id_token(token, project_id=None, fetcher=None):
+    """
+    Verifies signature, expiry, audience and issuer of a Firebase ID token and returns its claims.
+    """
+    project_id = project_id or frappe.conf.get(PROJECT_ID_CONFIG_KEY)
+    try:
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") != "RS256":
+            raise jwt.InvalidAlgorithmError(header.get("alg"))
+        key = get_signing_keys(fetcher).get(header.get("kid"))
+        if not key:
+            raise jwt.InvalidKeyError(header.get("kid"))
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=project_id,
+            issuer=f"https://securetoken.google.com/{project_id}",
+            options={"require": ["exp", "iat", "sub"]},
+        )
+    except jwt.PyJWTError as e:
+        frappe.throw(frappe._("Invalid token: {0}").format(e), frappe.AuthenticationError)
+    return claims
+
+
+def get_token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_local(token_hash):
+    entry = verified_tokens.get(token_hash)
+    if not entry:
+        return None
+    if entry["exp"] <= time.time():
+        verified_tokens.pop(token_hash, None)
+        return None
+    verified_tokens.move_to_end(token_hash)
+    return entry
+
+
+def set_local(token_hash, entry):
+    verified_tokens[token_hash] = entry
+    verified_tokens.move_to_end(token_hash)
+    while len(verified_tokens) > LOCAL_TOKEN_CACHE_SIZE:
+        verified_tokens.popitem(last=False)
+
+
+def get_user_from_token(token, project_id=None, fetcher=None):
+    """
+    Frappe user for a Firebase ID token, or None when no enabled user has the token's email.
+    Verified tokens are cached by hash until they expire, in memory and in Redis for the other workers.
+    """
+    if not token:
+        return None
+    token_hash = get_token_hash(token)
+    entry = get_local(token_hash)
+    if entry:
+        return entry["user"]
+    cache_key = f"godesi:firebase_token:{token_hash}"
+    entry = frappe.cache().get_value(cache_key)
+    if not entry:
+        claims = verify_id_token(token, project_id, fetcher)
+        email = claims.get("email")
+        user = frappe.db.get_value("User", {"email": email, "enabled": 1}) if email else None
+        if not user:
+            return None
+        entry = {"user": user, "exp": claims["exp"]}
+        frappe.cache().set_value(cache_key, entry, expires_in_sec=max(1, int(claims["exp"] - time.time())))
+    set_local(token_hash, entry)
+    return entry["user"]
+
+
+def login(token):
+    """
+    Logs the token's user in and returns the user, or None.
+    """
+    if not is_configured():
+        from iotready_firebase import admin
+
+        user = admin.log_into_frappe_with_id_token(token)
+        return getattr(user, "email", user)
+    user = get_user_from_token(token)
+    if not user:
+        return None
+    frappe.local.login_manager.login_as(user)
+    return user
@@ -0,0 +1,252 @@
+import frappe
+from iotready_godesi import archive, replica
+
+# `tabCrate Genealogy` is a closure table: one row for every (ancestor, descendant) pair, not just
+# direct parents, so a whole ancestry or subtree is a single indexed lookup.
+# Crate IDs are reused, so a node is one cycle of a crate: "<crate_id>:<activity>", where the activity is
+# the Procurement or Crate Splitting that started the cycle. Supplier and item are copied from that activity.
+# Crate Splitting links the parent's cycle -> the new crate's cycle. Customer Picking links the crate's cycle
+# -> the package, identified as "<picklist_id>/<package_id>" since package IDs are only unique within a pick list.
+# A package filled from several crates has several parents, so the genealogy is a DAG rather than a tree.
+GENEALOGY_ACTIVITIES = ["Crate Splitting", "Customer Picking"]
+CYCLE_ACTIVITIES = ["Procurement", "Crate Splitting"]
+BACKFILL_PAGE_SIZE = 1000
+
+
+def get_package_node(picklist_id, package_id):
+    return f"{picklist_id}/{package_id}"
+
+
+def get_cycle_node(crate_id, cycle_name):
+    return f"{crate_id}:{cycle_name}" if cycle_name else crate_id
+
+
+def is_cycle_node(node):
+    return ":" in node or "/" in node
+
+
+def get_activity_tables(include_archive=True):
+    tables = [archive.HOT_TABLE]
+    if include_archive and archive.archive_exists():
+        tables.append(archive.ARCHIVE_TABLE)
+    return tables
+
+
+def get_cycle_start(crate_id, at=None, include_archive=True):
+    """
+    The Procurement or Crate Splitting activity that started the crate's cycle current at `at` (default now),
+    as {name, supplier_id, item_code}, or None. The current cycle's start is never archived,
+    so `include_archive` is only needed for past cycles.
+    """
+    at = at or frappe.utils.now_datetime()
+    queries = [
+        f"""
+        (SELECT name, creation, supplier_id, item_code FROM `{table}`
+        WHERE crate_id = %(crate_id)s AND activity IN %(activities)s AND creation <= %(at)s
+        ORDER BY creation DESC LIMIT 1)
+        """
+        for table in get_activity_tables(include_archive)
+    ]
+    rows = frappe.db.sql(
+        " UNION ALL ".join(queries) + " ORDER BY creation DESC LIMIT 1",
+        {"crate_id": crate_id, "activities": CYCLE_ACTIVITIES, "at": at},
+        as_dict=True,
+    )
+    return rows[0] if rows else None
+
+
+def get_crate_node(crate_id, at=None, include_archive=True):
+    """
+    (node, supplier_id, item_code) for the cycle of `crate_id` current at `at`.
+    """
+    cycle = get_cycle_start(crate_id, at, include_archive)
+    if not cycle:
+        return crate_id, None, None
+    return get_cycle_node(crate_id, cycle.name), cycle.supplier_id, cycle.item_code
+
+
+def get_edge(doc, include_archive=True):
+    """
+    Parent and child nodes recorded by a Completed activity, or None.
+    """
+    if doc.get("status") != "Completed":
+        return None
+    if doc.get("activity") == "Crate Splitting" and doc.get("parent_crate_id"):
+        # The split starts the new crate's cycle; the parent is in the cycle it had when split
+        parent, supplier_id, item_code = get_crate_node(doc.parent_crate_id, doc.creation, include_archive)
+        return {
+            "parent": parent,
+            "parent_crate_id": doc.parent_crate_id,
+            "parent_supplier_id": supplier_id,
+            "parent_item_code": item_code,
+            "child": get_cycle_node(doc.crate_id, doc.name),
+            "child_crate_id": doc.crate_id,
+            "child_type": "Crate",
+        }
+    if doc.get("activity") == "Customer Picking" and doc.get("package_id"):
+        # A whole crate picked as its own package stays the same node
+        if str(doc.package_id) == doc.crate_id:
+            return None
+        parent, supplier_id, item_code = get_crate_node(doc.crate_id, doc.creation, include_archive)
+        return {
+            "parent": parent,
+            "parent_crate_id": doc.crate_id,
+            "parent_supplier_id": supplier_id,
+            "parent_item_code": item_code,
+            "child": get_package_node(doc.picklist_id, doc.package_id),
+            "child_crate_id": None,
+            "child_type": "Package",
+        }
+    return None
+
+
+def add_edge(parent, child, parent_crate_id=None, parent_supplier_id=None, parent_item_code=None,
+             child_crate_id=None, child_type="Crate"):
+    """
+    Links every ancestor of `parent` (and `parent`) to every descendant of `child` (and `child`).
+    Pairs that already exist keep their first depth.
+    """
+    if not parent or not child or parent == child:
+        return
+    frappe.db.sql(
+        """
+        INSERT IGNORE INTO `tabCrate Genealogy`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+            ancestor, ancestor_crate_id, ancestor_supplier_id, ancestor_item_code,
+            descendant, descendant_crate_id, descendant_type, depth)
+        SELECT MD5(CONCAT_WS('|', a.ancestor, d.descendant)), NOW(), NOW(), %(user)s, %(user)s, 0, 0,
+            a.ancestor, a.ancestor_crate_id, a.ancestor_supplier_id, a.ancestor_item_code,
+            d.descendant, d.descendant_crate_id, d.descendant_type, a.depth + d.depth + 1
+        FROM (
+            SELECT ancestor, ancestor_crate_id, ancestor_supplier_id, ancestor_item_code, depth
+            FROM `tabCrate Genealogy` WHERE descendant = %(parent)s
+            UNION ALL SELECT %(parent)s, %(parent_crate_id)s, %(parent_supplier_id)s, %(parent_item_code)s, 0
+        ) a
+        CROSS JOIN (
+            SELECT descendant, descendant_crate_id, descendant_type, depth
+            FROM `tabCrate Genealogy` WHERE ancestor = %(child)s
+            UNION ALL SELECT %(child)s, %(child_crate_id)s, %(child_type)s, 0
+        ) d
+        WHERE a.ancestor != d.descendant
+        """,
+        {
+            "parent": parent,
+            "parent_crate_id": parent_crate_id,
+            "parent_supplier_id": parent_supplier_id,
+            "parent_item_code": parent_item_code,
+            "child": child,
+            "child_crate_id": child_crate_id,
+            "child_type": child_type,
+            "user": frappe.session.user,
+        },
+    )
+
+
+def crate_activity_on_update(doc, event=None):
+    # A new activity belongs to the current cycles, which are always in the hot table
+    edge = get_edge(doc, include_archive=False)
+    if edge:
+        add_edge(**edge)
+
+
+def get_backfill_page(table, after, page_size):
+    sql = f"""
+    SELECT name, creation, activity, status, crate_id, parent_crate_id, picklist_id, package_id
+    FROM `{table}`
+    WHERE status = 'Completed' AND activity IN %(activities)s
+        AND (creation > %(creation)s OR (creation = %(creation)s AND name > %(name)s))
+    ORDER BY creation ASC, name ASC
+    LIMIT %(page_size)s
+    """
+    values = {"activities": GENEALOGY_ACTIVITIES, "creation": after[0], "name": after[1], "page_size": page_size}
+    return frappe.db.sql(sql, values, as_dict=True)
+
+
+def rebuild_genealogy(page_size=BACKFILL_PAGE_SIZE):
+    """
+    Rebuilds the closure table from Completed split and picking activities, in the archive and the hot table,
+    oldest first and a page at a time. Run by a patch on migrate; safe to repeat.
+    """
+    frappe.db.sql("DELETE FROM `tabCrate Genealogy`")
+    count = 0
+    # The archive holds the earlier cycles, so it goes first
+    for table in reversed(get_activity_tables()):
+        after = ("1970-01-01", "")
+        while True:
+            activities = get_backfill_page(table, after, page_size)
+            if not activities:
+                break
+            for activity in activities:
+                edge = get_edge(activity)
+                if edge:
+                    add_edge(**edge)
+            count += len(activities)
+            after = (activities[-1].creation, activities[-1].name)
+            frappe.db.commit()
+    return count
+
+
+def resolve_node(crate_id):
+    # A bare crate ID means its current cycle
+    if is_cycle_node(crate_id):
+        return crate_id
+    return get_crate_node(crate_id)[0]
+
+
+@replica.read_only
+def get_ancestors(node):
+    """
+    Every crate cycle `node` came from, nearest first, with the supplier and item it was procured or split with.
+    """
+    return frappe.db.sql(
+        """
+        SELECT ancestor AS node, ancestor_crate_id AS crate_id, depth,
+            ancestor_supplier_id AS supplier_id, ancestor_item_code AS item_code
+        FROM `tabCrate Genealogy`
+        WHERE descendant = %s
+        ORDER BY depth ASC, ancestor ASC
+        """,
+        node,
+        as_dict=True,
+    )
+
+
+@replica.read_only
+def get_descendants(node):
+    """
+    Every crate cycle and package derived from `node`, with the direct parents of each, shallowest first.
+    """
+    rows = frappe.db.sql(
+        """
+        SELECT g.descendant, g.descendant_crate_id, g.depth, g.descendant_type, p.ancestor AS parent
+        FROM `tabCrate Genealogy` g
+        LEFT JOIN `tabCrate Genealogy` p ON p.descendant = g.descendant AND p.depth = 1
+        WHERE g.ancestor = %s
+        ORDER BY g.depth ASC, g.descendant ASC
+        """,
+        node,
+        as_dict=True,
+    )
+    nodes = {}
+    for row in rows:
+        node = nodes.setdefault(
+            row.descendant,
+            {
+                "id": row.descendant,
+                "crate_id": row.descendant_crate_id,
+                "type": row.descendant_type,
+                "depth": row.depth,
+                "parents": [],
+            },
+        )
+        if row.parent:
+            node["parents"].append(row.parent)
+    return list(nodes.values())
+
+
+def get_genealogy(crate_id):
+    """
+    `crate_id` is a crate (its current cycle), a "<crate_id>:<activity>" cycle, or a "<picklist_id>/<package_id>" package.
+    """
+    node = resolve_node(crate_id)
+    return {"crate_id": crate_id, "node": node, "ancestors": get_ancestors(node), "descendants": get_descendants(node)}
@@ -104,12 +104,53 @@ required_apps = ["erpnext"]
 # Hook on document methods and events
 
 doc_events = {
-    "Warehouse": {"before_save": "iotready_godesi.doc_hooks.warehouse_before_save"},
+    "Warehouse": {
+        "before_save": "iotready_godesi.doc_hooks.warehouse_before_save",
+        "on_update": "iotready_godesi.bundles.clear_validation_bundles",
+        "on_trash": "iotready_godesi.bundles.clear_validation_bundles",
+    },
+    "Item": {
+        "on_update": "iotready_godesi.bundles.clear_validation_bundles",
+        "on_trash": "iotready_godesi.bundles.clear_validation_bundles",
+    },
+    "Supplier": {
+        "on_update": "iotready_godesi.bundles.clear_validation_bundles",
+        "on_trash": "iotready_godesi.bundles.clear_validation_bundles",
+    },
+    "Vehicle": {
+        "on_update": "iotready_godesi.bundles.clear_validation_bundles",
+        "on_trash": "iotready_godesi.bundles.clear_validation_bundles",
+    },
+    "Crate": {"after_insert": "iotready_godesi.crate_ids.crate_after_insert"},
+    "Crate Activity": {
+        "on_update": [
+            "iotready_godesi.manifests.crate_activity_on_update",
+            "iotready_godesi.genealogy.crate_activity_on_update",
+        ],
+        "after_delete": "iotready_godesi.manifests.crate_activity_after_delete",
+    },
 }
 
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+    "all": [
+        "iotready_godesi.querylog.flush_slow_queries",
+        "iotready_godesi.rollups.update_throughput_rollups",
+    ],
+    "hourly_long": [
+        "iotready_godesi.drafts.purge_stale_drafts",
+        "iotready_godesi.exports.export_columnar",
+    ],
+    "daily": [
+        "iotready_godesi.crate_ids.expire_crate_id_blocks",
+    ],
+    "daily_long": [
+        "iotready_godesi.archive.archive_crate_activities",
+    ],
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"iotready_godesi.tasks.all"
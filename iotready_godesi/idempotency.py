@@ -0,0 +1,122 @@
+import frappe
+import functools
+import json
+import time
+from collections import OrderedDict
+from iotready_warehouse_traceability_frappe import utils as common_utils
+
+# Mobile clients retry record_session_events on timeouts. Responses are remembered per
+# client-supplied key so that a retry gets the original answer instead of being re-processed.
+IDEMPOTENCY_TTL = 6 * 60 * 60
+# Used only when Redis is unreachable; bounded so a busy worker cannot grow it without limit
+LOCAL_STORE_SIZE = 5000
+# A key is held by this marker while its request runs, so a retry cannot process the same crates alongside it.
+# The short TTL frees the key if the worker dies without committing or rolling back.
+PENDING = "__pending__"
+PENDING_TTL = 60
+# A retry that finds the key pending waits this long for the original response, then gets a 409
+PENDING_WAIT_SECONDS = 5
+PENDING_POLL_SECONDS = 0.2
+
+
+class RequestInProgressError(frappe.ValidationError):
+    http_status_code = 409
+
+local_store = OrderedDict()
+
+
+def make_key(key):
+    return frappe.cache().make_key(f"godesi:idempotency:{frappe.session.user}:{key}")
+
+
+def get_local(cache_key):
+    entry = local_store.get(cache_key)
+    if not entry:
+        return None
+    expires_at, value = entry
+    if expires_at < time.time():
+        local_store.pop(cache_key, None)
+        return None
+    return value
+
+
+def set_local(cache_key, value, ttl):
+    local_store[cache_key] = (time.time() + ttl, value)
+    local_store.move_to_end(cache_key)
+    while len(local_store) > LOCAL_STORE_SIZE:
+        local_store.popitem(last=False)
+
+
+def get_response(key):
+    """
+    Returns the stored response for an idempotency key, or None.
+    """
+    if not key:
+        return None
+    cache_key = make_key(key)
+    try:
+        value = frappe.cache().get(cache_key)
+    except Exception:
+        return get_local(cache_key)
+    if value is None or value == PENDING.encode():
+        return get_local(cache_key)
+    return json.loads(value)
+
+
+def reserve(key, ttl=PENDING_TTL):
+    """
+    Claims `key` for the current request and returns None, or returns the response stored for it.
+    While another request holds the key, waits for its response and raises RequestInProgressError
+    if none arrives in time. The claim is dropped if the transaction rolls back.
+    """
+    if not key:
+        return None
+    cache_key = make_key(key)
+    deadline = time.time() + PENDING_WAIT_SECONDS
+    while True:
+        try:
+            if frappe.cache().set(cache_key, PENDING, nx=True, ex=ttl):
+                frappe.db.after_rollback.add(functools.partial(release, key))
+                return None
+            value = frappe.cache().get(cache_key)
+        except Exception:
+            return get_local(cache_key)
+        if value is not None and value != PENDING.encode():
+            return json.loads(value)
+        if value is not None and time.time() >= deadline:
+            frappe.throw("This request is still being processed. Please retry shortly.", RequestInProgressError)
+        if value is not None:
+            time.sleep(PENDING_POLL_SECONDS)
+
+
+def release(key):
+    """
+    Drops a claim without storing a response, so a retry is processed again.
+    """
+    if not key:
+        return
+    cache_key = make_key(key)
+    try:
+        if frappe.cache().get(cache_key) == PENDING.encode():
+            frappe.cache().delete(cache_key)
+    except Exception:
+        pass
+
+
+def store_response(cache_key, value, ttl):
+    try:
+        frappe.cache().setex(cache_key, ttl, value)
+    except Exception:
+        set_local(cache_key, json.loads(value), ttl)
+
+
+def set_response(key, response, ttl=IDEMPOTENCY_TTL):
+    """
+    Stores the response once the request's transaction commits. Until then the key stays pending,
+    so a response is never remembered for work that was rolled back.
+    """
+    if not key:
+        return
+    cache_key = make_key(key)
+    value = json.dumps(response, default=common_utils.date_json_serial)
+    frappe.db.after_commit.add(functools.partial(store_response, cache_key, value, ttl))
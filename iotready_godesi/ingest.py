@@ -0,0 +1,145 @@
+import frappe
+import json
+from datetime import datetime, timedelta
+from iotready_godesi import replica, webutils
+from iotready_warehouse_traceability_frappe import workflows
+from iotready_warehouse_traceability_frappe import utils as common_utils
+
+# Events are committed per chunk so a long backlog never holds one giant transaction
+INGEST_CHUNK_SIZE = 200
+
+
+def parse_events(lines):
+    """
+    Yields (line_number, event) for an NDJSON stream. Each event is either a crate dict carrying
+    its own session_id, or {"session_id": ..., "crate": {...}}. Blank lines are skipped.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode()
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, event
+
+
+def chunked(iterable, size):
+    chunk = []
+    for row in iterable:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def get_event_crate(event):
+    if not isinstance(event, dict):
+        return None, None
+    crate = event.get("crate") if isinstance(event.get("crate"), dict) else event
+    session_id = event.get("session_id") or crate.get("session_id")
+    return session_id, crate
+
+
+def failed_result(line_number, session_id, crate_id, message):
+    return {
+        "line": line_number,
+        "session_id": session_id,
+        "crate_id": crate_id,
+        "success": False,
+        "message": message,
+    }
+
+
+def publish_progress(processed, succeeded, failed):
+    frappe.publish_realtime(
+        "godesi_ingest_progress",
+        message={"processed": processed, "succeeded": succeeded, "failed": failed},
+        user=frappe.session.user,
+    )
+
+
+def ingest_session_events(lines, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Replays an offline backlog of crate events across sessions through the regular activity handlers.
+    Summaries are computed once per session at the end instead of once per batch.
+    """
+    creation = datetime.now() + timedelta(hours=5, minutes=30)
+    results = []
+    sessions = {}
+    succeeded = 0
+    failed = 0
+    for chunk in chunked(parse_events(lines), chunk_size):
+        for line_number, event in chunk:
+            session_id, crate = get_event_crate(event)
+            if crate is None:
+                results.append(failed_result(line_number, None, None, "Invalid JSON"))
+                failed += 1
+                continue
+            if session_id not in sessions:
+                session_context = webutils.get_clean_session_context(session_id) if session_id else None
+                sessions[session_id] = {
+                    "activity": session_context.get("activity") if session_context else None,
+                    "crates": [],
+                    "responses": [],
+                }
+            session = sessions[session_id]
+            if not session["activity"]:
+                results.append(failed_result(line_number, session_id, crate.get("crate_id"), "Session Expired"))
+                failed += 1
+                continue
+            crate_out = webutils.process_session_crate(crate, session_id, session["activity"])
+            replica.mark_write(session_id)
+            session["crates"].append(crate)
+            session["responses"].append(crate_out)
+            results.append(
+                {
+                    "line": line_number,
+                    "session_id": session_id,
+                    "crate_id": crate_out.get("crate_id"),
+                    "success": crate_out["success"],
+                    "message": crate_out["message"],
+                    "label": crate_out.get("label", ""),
+                }
+            )
+            if crate_out["success"]:
+                succeeded += 1
+            else:
+                failed += 1
+        frappe.db.commit()
+        # Published right away, as the chunk is already committed
+        publish_progress(len(results), succeeded, failed)
+    summaries = {}
+    for session_id, session in sessions.items():
+        if not session["crates"]:
+            continue
+        activity = session["activity"]
+        payload = webutils.get_session_summary_payload(
+            session_id, activity, session["crates"], workflows.get_activity_session(session_id)
+        )
+        summary = json.dumps(payload, default=common_utils.date_json_serial)
+        webutils.publish_session_summary(session_id, summary)
+        workflows.log_ingress(
+            session["crates"],
+            activity,
+            {"session_id": session_id, "crates": session["responses"], "summary": summary},
+            creation,
+        )
+        summaries[session_id] = {
+            "activity": activity,
+            "item_summary": payload["item_summary"],
+            "crate_summary": payload["crate_summary"],
+        }
+    return {
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": failed,
+        "results": results,
+        "sessions": summaries,
+    }
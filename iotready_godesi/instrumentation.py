@@ -0,0 +1,189 @@
+import frappe
+import functools
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Opt-in per site with `"godesi_instrumentation": 1` in site_config.json. When disabled,
+# instrumented functions cost one config lookup per call.
+CONFIG_KEY = "godesi_instrumentation"
+# Rolling store of the most recent calls, per worker process
+MAX_SAMPLES = 2000
+
+samples = deque(maxlen=MAX_SAMPLES)
+cache_patched = False
+
+
+def is_enabled():
+    return bool(frappe.conf.get(CONFIG_KEY))
+
+
+class Probe:
+    def __init__(self, method):
+        self.method = method
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.phases = {}
+        self.stack = []
+
+    def add_phase_time(self, name, elapsed):
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def as_dict(self):
+        return {
+            "method": self.method,
+            "timestamp": time.time(),
+            "wall_ms": (time.perf_counter() - self.started) * 1000,
+            "sql_count": self.sql_count,
+            "sql_ms": self.sql_time * 1000,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "phases_ms": {k: v * 1000 for k, v in self.phases.items()},
+        }
+
+
+def get_probe():
+    return getattr(frappe.local, "godesi_probe", None)
+
+
+def count_cache(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        value = fn(*args, **kwargs)
+        probe = get_probe()
+        if probe:
+            if value is None:
+                probe.cache_misses += 1
+            else:
+                probe.cache_hits += 1
+        return value
+
+    return wrapper
+
+
+def patch_cache():
+    """
+    The Redis wrapper is shared by all threads of a worker, so it is patched once at class level
+    and only counts while a probe is active on the current request.
+    """
+    global cache_patched
+    if cache_patched:
+        return
+    cache_class = type(frappe.cache())
+    cache_class.get_value = count_cache(cache_class.get_value)
+    cache_class.hget = count_cache(cache_class.hget)
+    cache_patched = True
+
+
+@contextmanager
+def patch_sql(probe):
+    # frappe.db is request-local, so patching the instance only affects this request
+    original_sql = frappe.db.sql
+
+    def sql(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original_sql(*args, **kwargs)
+        finally:
+            probe.sql_count += 1
+            probe.sql_time += time.perf_counter() - start
+
+    frappe.db.sql = sql
+    try:
+        yield
+    finally:
+        frappe.db.sql = original_sql
+
+
+@contextmanager
+def phase(name):
+    """
+    Times a phase of the current request. Phases are exclusive: time spent in a nested phase
+    is attributed to the inner one only.
+    """
+    probe = get_probe()
+    if not probe:
+        yield
+        return
+    now = time.perf_counter()
+    if probe.stack:
+        parent, parent_started = probe.stack[-1]
+        probe.add_phase_time(parent, now - parent_started)
+    probe.stack.append((name, now))
+    try:
+        yield
+    finally:
+        name, started = probe.stack.pop()
+        now = time.perf_counter()
+        probe.add_phase_time(name, now - started)
+        if probe.stack:
+            parent, _ = probe.stack[-1]
+            probe.stack[-1] = (parent, now)
+
+
+def instrument(fn=None, phase_name=None):
+    """
+    Records wall time, SQL count and time, cache hits and misses for a call.
+    Nested instrumented calls are recorded as phases of the outermost one, named `phase_name`
+    or after the function.
+    """
+    if fn is None:
+        return functools.partial(instrument, phase_name=phase_name)
+    method = f"{fn.__module__}.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not is_enabled():
+            return fn(*args, **kwargs)
+        if get_probe():
+            with phase(phase_name or fn.__name__):
+                return fn(*args, **kwargs)
+        patch_cache()
+        probe = Probe(method)
+        frappe.local.godesi_probe = probe
+        try:
+            with patch_sql(probe):
+                return fn(*args, **kwargs)
+        finally:
+            frappe.local.godesi_probe = None
+            samples.append(probe.as_dict())
+
+    return wrapper
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def get_stats():
+    """
+    Aggregates the rolling store per method. Only covers calls served by this worker.
+    """
+    methods = {}
+    for sample in list(samples):
+        methods.setdefault(sample["method"], []).append(sample)
+    stats = {}
+    for method, rows in methods.items():
+        wall = [r["wall_ms"] for r in rows]
+        phases = {}
+        for r in rows:
+            for name, elapsed in r["phases_ms"].items():
+                phases[name] = phases.get(name, 0.0) + elapsed
+        stats[method] = {
+            "calls": len(rows),
+            "wall_ms_p50": percentile(wall, 50),
+            "wall_ms_p95": percentile(wall, 95),
+            "wall_ms_max": max(wall),
+            "sql_count_avg": sum([r["sql_count"] for r in rows]) / len(rows),
+            "sql_ms_avg": sum([r["sql_ms"] for r in rows]) / len(rows),
+            "cache_hits": sum([r["cache_hits"] for r in rows]),
+            "cache_misses": sum([r["cache_misses"] for r in rows]),
+            "phases_ms_avg": {k: v / len(rows) for k, v in phases.items()},
+        }
+    return {"enabled": is_enabled(), "samples": len(samples), "methods": stats}
@@ -0,0 +1,8 @@
+// Copyright (c) 2026, IoTReady and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Crate Genealogy', {
+	// refresh: function(frm) {
+
+	// }
+});
@@ -0,0 +1,412 @@
+"""
+Load test for the handheld scan APIs.
+
+Simulates N concurrent handhelds, each running a full session flow against a running site:
+Procurement -> Transfer Out -> Transfer In (-> Customer Picking) through record_session_events.
+
+1. Seed master data on the site under test (needs `allow_tests` in site_config.json):
+
+    bench --site godesi.localhost execute iotready_godesi.loadtest.seed_master_data --kwargs "{'handhelds': 8}"
+
+2. Run the load test from any machine that can reach the site:
+
+    python -m iotready_godesi.loadtest --base-url http://localhost:8000 --handhelds 8 --crates 50 \\
+        --target-warehouse "Load Test Target - GD" --submit-method <session submit method>
+
+Sessions are submitted through --submit-method, the same endpoint the handheld app uses.
+Without it only the Procurement stage is run, since later stages need submitted sessions.
+
+With --contention every handheld transfers out the same crates at the same time instead. Each crate must
+be accepted exactly once; the other scans are rejected by the compare-and-swap on the crate's version.
+"""
+import random
+import argparse
+import json
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+SOURCE_WAREHOUSE = "Load Test Source"
+TARGET_WAREHOUSE = "Load Test Target"
+TRANSIT_WAREHOUSE = "Load Test Transit"
+ITEM_CODE = "LOADTEST-ITEM"
+SUPPLIER = "Load Test Supplier"
+VEHICLE = "LOADTEST-01"
+PASSWORD = "LoadTest@123"
+ROLES = ["Procurement User", "Stock User"]
+SCAN_METHODS = ["iotready_godesi.api.record_session_events"]
+
+headers = {
+    "Content-Type": "application/json",
+    "Accept": "application/json",
+}
+
+
+def get_user(role, index):
+    return f"loadtest-{role}-{index}@example.com"
+
+
+# Server side -------------------------------------------------------------------------------------
+
+
+def seed_master_data(handhelds=8):
+    """
+    Creates the item, supplier, vehicle, warehouses and handheld users used by the load test.
+    Safe to run repeatedly. Run through `bench execute`, never on a production site.
+    """
+    import frappe
+
+    if not frappe.conf.allow_tests:
+        frappe.throw("Seeding load test data requires allow_tests in site_config.json")
+    company = frappe.defaults.get_global_default("company")
+    if not frappe.db.exists("Item", ITEM_CODE):
+        frappe.get_doc(
+            {
+                "doctype": "Item",
+                "item_code": ITEM_CODE,
+                "item_name": "Load Test Item",
+                "item_group": frappe.db.get_value("Item Group", {"is_group": 0}, "name"),
+                "stock_uom": "Nos",
+                "secondary_box_weight": 1,
+                "tertiary_packaging_weight": 1,
+                "tertiary_package_quantity": 20,
+                "lower_tolerance": 10,
+                "upper_tolerance": 10,
+            }
+        ).insert(ignore_permissions=True)
+    if not frappe.db.exists("Supplier", SUPPLIER):
+        frappe.get_doc(
+            {
+                "doctype": "Supplier",
+                "supplier_name": SUPPLIER,
+                "supplier_group": frappe.db.get_value("Supplier Group", {"is_group": 0}, "name"),
+            }
+        ).insert(ignore_permissions=True)
+    if not frappe.db.exists("Vehicle", VEHICLE):
+        frappe.get_doc(
+            {
+                "doctype": "Vehicle",
+                "license_plate": VEHICLE,
+                "make": "Load Test",
+                "model": "Load Test",
+                "last_odometer": 0,
+                "uom": "Litre",
+                "fuel_type": "Diesel",
+            }
+        ).insert(ignore_permissions=True)
+    for index in range(handhelds):
+        for role in ["source", "target"]:
+            email = get_user(role, index)
+            if frappe.db.exists("User", email):
+                continue
+            user = frappe.get_doc(
+                {
+                    "doctype": "User",
+                    "email": email,
+                    "first_name": f"Load Test {role} {index}",
+                    "new_password": PASSWORD,
+                    "send_welcome_email": 0,
+                }
+            )
+            user.insert(ignore_permissions=True)
+            user.add_roles(*ROLES)
+    warehouse_names = {}
+    for warehouse_name, role in [(TRANSIT_WAREHOUSE, None), (SOURCE_WAREHOUSE, "source"), (TARGET_WAREHOUSE, "target")]:
+        name = frappe.db.get_value("Warehouse", {"warehouse_name": warehouse_name})
+        if name:
+            doc = frappe.get_doc("Warehouse", name)
+        else:
+            doc = frappe.new_doc("Warehouse")
+            doc.warehouse_name = warehouse_name
+            doc.company = company
+        if role:
+            doc.default_in_transit_warehouse = warehouse_names[TRANSIT_WAREHOUSE]
+            doc.crate_label_template = "{qr_code} {description1} {quantity} {weight} {batch_id} {time}"
+            doc.batch_prefix = f"LT{role[0].upper()}"
+            doc.set("user_table", [{"user": get_user(role, i)} for i in range(handhelds)])
+            if role == "source":
+                doc.set("item_table", [{"item_code": ITEM_CODE}])
+                doc.set("supplier_table", [{"supplier": SUPPLIER}])
+        doc.save(ignore_permissions=True)
+        warehouse_names[warehouse_name] = doc.name
+    source = frappe.get_doc("Warehouse", warehouse_names[SOURCE_WAREHOUSE])
+    source.set("destination_table", [{"warehouse": warehouse_names[TARGET_WAREHOUSE]}])
+    source.save(ignore_permissions=True)
+    frappe.db.commit()
+    return warehouse_names
+
+
+# Client side -------------------------------------------------------------------------------------
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    # Nearest-rank percentile
+    values = sorted(values)
+    index = max(0, math.ceil(p / 100 * len(values)) - 1)
+    return values[index]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.started = time.perf_counter()
+
+    def record(self, endpoint, elapsed, ok, crates=0, crate_errors=0):
+        with self.lock:
+            calls = self.calls.setdefault(endpoint, {"latencies": [], "errors": 0, "crates": 0, "crate_errors": 0})
+            calls["latencies"].append(elapsed)
+            calls["crates"] += crates
+            calls["crate_errors"] += crate_errors
+            if not ok:
+                calls["errors"] += 1
+
+    def report(self):
+        duration = time.perf_counter() - self.started
+        rows = []
+        for endpoint, calls in sorted(self.calls.items()):
+            latencies = calls["latencies"]
+            rows.append(
+                {
+                    "endpoint": endpoint,
+                    "requests": len(latencies),
+                    "errors": calls["errors"],
+                    "error_rate": calls["errors"] / len(latencies),
+                    "crates": calls["crates"],
+                    "crate_errors": calls["crate_errors"],
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    "throughput_rps": len(latencies) / duration,
+                }
+            )
+        return {"duration_s": duration, "endpoints": rows}
+
+
+def print_report(report):
+    print(f"Duration: {report['duration_s']:.1f}s")
+    print(f"{'endpoint':<45}{'reqs':>7}{'err%':>7}{'crates':>8}{'c.err':>7}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'rps':>8}")
+    for row in report["endpoints"]:
+        print(
+            f"{row['endpoint']:<45}{row['requests']:>7}{row['error_rate'] * 100:>7.1f}"
+            f"{row['crates']:>8}{row['crate_errors']:>7}"
+            f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}{row['throughput_rps']:>8.1f}"
+        )
+
+
+class Handheld:
+    def __init__(self, base_url, user, stats):
+        self.base_url = base_url
+        self.user = user
+        self.stats = stats
+        self.session = requests.Session()
+
+    def post(self, method, payload):
+        url = f"{self.base_url}/api/method/{method}"
+        start = time.perf_counter()
+        ok = False
+        message = None
+        crates = crate_errors = 0
+        try:
+            response = self.session.post(url, headers=headers, data=json.dumps(payload), timeout=120)
+            if response.ok:
+                message = response.json().get("message")
+                ok = True
+        except (requests.RequestException, ValueError):
+            pass
+        # Scans answer 200 with a result per crate; a crate that failed is an error too
+        if method in SCAN_METHODS and isinstance(message, dict):
+            results = message.get("crates") or []
+            crates = len(results)
+            crate_errors = sum(1 for crate in results if not crate.get("success"))
+            ok = ok and not crate_errors
+        self.stats.record(method.split(".")[-1], time.perf_counter() - start, ok, crates, crate_errors)
+        return message
+
+    def login(self):
+        self.post("login", {"usr": self.user, "pwd": PASSWORD})
+
+    def start_session(self, activity, metadata):
+        context = self.post("iotready_godesi.api.get_new_activity_session", {"activity": activity})
+        if not context:
+            return None
+        session_id = context["session_id"]
+        self.post(
+            "iotready_godesi.api.update_activity_session",
+            {"session_id": session_id, "context": json.dumps(metadata)},
+        )
+        return session_id
+
+    def scan(self, session_id, crates, batch_size):
+        results = []
+        for i in range(0, len(crates), batch_size):
+            batch = crates[i : i + batch_size]
+            response = self.post(
+                "iotready_godesi.api.record_session_events",
+                {"crates": batch, "session_id": session_id, "idempotency_key": uuid.uuid4().hex},
+            )
+            if response:
+                results += response["crates"]
+        return results
+
+    def run_stage(self, activity, metadata, crates, batch_size, submit_method):
+        session_id = self.start_session(activity, metadata)
+        if not session_id:
+            return []
+        results = self.scan(session_id, crates, batch_size)
+        if submit_method:
+            self.post(submit_method, {"session_id": session_id})
+        return [r["crate_id"] for r in results if r.get("success")]
+
+    def scan_results(self, activity, metadata, crates, batch_size):
+        session_id = self.start_session(activity, metadata)
+        if not session_id:
+            return []
+        return self.scan(session_id, crates, batch_size)
+
+
+def generate_crate_ids(prefix, handheld, count):
+    return [f"{prefix}{str(handheld).zfill(2)}{str(i).zfill(5)}" for i in range(count)]
+
+
+def run_handheld(index, args, stats):
+    source = Handheld(args.base_url, get_user("source", index), stats)
+    target = Handheld(args.base_url, get_user("target", index), stats)
+    source.login()
+    target.login()
+    crate_ids = generate_crate_ids(args.prefix, index, args.crates)
+    procured = source.run_stage(
+        "Procurement",
+        {"supplier": SUPPLIER, "item_code": ITEM_CODE},
+        [{"crate_id": c, "quantity": 20, "weight": 21} for c in crate_ids],
+        args.batch_size,
+        args.submit_method,
+    )
+    if not args.submit_method:
+        return
+    transferred = source.run_stage(
+        "Transfer Out",
+        {"target_warehouse": args.target_warehouse, "vehicle": VEHICLE},
+        [{"crate_id": c} for c in procured],
+        args.batch_size,
+        args.submit_method,
+    )
+    received = target.run_stage(
+        "Transfer In",
+        {},
+        [{"crate_id": c} for c in transferred],
+        args.batch_size,
+        args.submit_method,
+    )
+    if args.picklist:
+        target.run_stage(
+            "Customer Picking",
+            {"picklist_id": args.picklist, "package_id": "Whole"},
+            [{"crate_id": c, "weight": 21} for c in received],
+            1,
+            None,
+        )
+
+
+def run_contention(args, stats):
+    """
+    All source handhelds scan the same procured crates for Transfer Out concurrently, each in its own order.
+    Returns how many scans were accepted and rejected, and any crate accepted more than once.
+    """
+    procurer = Handheld(args.base_url, get_user("source", 0), stats)
+    procurer.login()
+    procured = procurer.run_stage(
+        "Procurement",
+        {"supplier": SUPPLIER, "item_code": ITEM_CODE},
+        [{"crate_id": c, "quantity": 20, "weight": 21} for c in generate_crate_ids(args.prefix, 0, args.crates)],
+        args.batch_size,
+        args.submit_method,
+    )
+
+    def contend(index):
+        handheld = Handheld(args.base_url, get_user("source", index), stats)
+        handheld.login()
+        crates = [{"crate_id": c} for c in procured]
+        random.Random(index).shuffle(crates)
+        return handheld.scan_results(
+            "Transfer Out",
+            {"target_warehouse": args.target_warehouse, "vehicle": VEHICLE},
+            crates,
+            args.batch_size,
+        )
+
+    with ThreadPoolExecutor(max_workers=args.handhelds) as executor:
+        results = [r for rows in executor.map(contend, range(args.handhelds)) for r in rows]
+    accepted = {}
+    conflicts = 0
+    for result in results:
+        if result.get("success"):
+            accepted[result["crate_id"]] = accepted.get(result["crate_id"], 0) + 1
+        elif "another device" in (result.get("message") or ""):
+            conflicts += 1
+    return {
+        "crates": len(procured),
+        "scans": len(results),
+        "accepted": sum(accepted.values()),
+        "conflicts": conflicts,
+        "rejected": len(results) - sum(accepted.values()),
+        "duplicates": sorted(crate_id for crate_id, count in accepted.items() if count > 1),
+    }
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Simulate concurrent handhelds against a Go Desi site.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--handhelds", type=int, default=8, help="Concurrent handhelds (seeded users).")
+    parser.add_argument("--crates", type=int, default=50, help="Crates per handheld.")
+    parser.add_argument("--batch-size", type=int, default=1, help="Crates per record_session_events call.")
+    parser.add_argument("--prefix", default=f"LT{int(time.time()) % 100000}-", help="Crate ID prefix.")
+    parser.add_argument("--target-warehouse", help="Name of the seeded target warehouse, as returned by seed_master_data.")
+    parser.add_argument("--submit-method", help="Whitelisted method that submits an activity session.")
+    parser.add_argument("--picklist", help="Open Pick List assigned to the target users, enables Customer Picking.")
+    parser.add_argument(
+        "--contention", action="store_true", help="Have every handheld transfer out the same crates concurrently."
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.submit_method and not args.target_warehouse:
+        parser.error("--target-warehouse is required to run the Transfer Out stage")
+    if args.contention and not args.submit_method:
+        parser.error("--submit-method is required to procure the crates for --contention")
+    stats = Stats()
+    if args.contention:
+        contention = run_contention(args, stats)
+    else:
+        with ThreadPoolExecutor(max_workers=args.handhelds) as executor:
+            futures = [executor.submit(run_handheld, i, args, stats) for i in range(args.handhelds)]
+            for future in futures:
+                future.result()
+    report = stats.report()
+    if args.contention:
+        report["contention"] = contention
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+        if args.contention:
+            print(
+                f"Contention: {contention['crates']} crates, {contention['scans']} scans, "
+                f"{contention['accepted']} accepted, {contention['conflicts']} version conflicts, "
+                f"{contention['rejected']} rejected, {len(contention['duplicates'])} duplicates"
+            )
+    return report
+
+
+if __name__ == "__main__":
+    main()
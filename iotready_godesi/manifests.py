@@ -0,0 +1,176 @@
+import frappe
+from iotready_godesi import querylog
+
+TRANSFER_OUT_ACTIVITIES = ["Transfer Out", "Crate Tracking Out"]
+TRANSFER_IN_ACTIVITIES = ["Transfer In", "Bulk Transfer In", "Crate Tracking In"]
+BUILD_PAGE_SIZE = 500
+
+
+def get_transfer_out_totals(reference_id):
+    sql = """
+    SELECT COUNT(DISTINCT crate_id) AS expected, MAX(source_warehouse) AS source_warehouse, MAX(target_warehouse) AS target_warehouse
+    FROM `tabCrate Activity`
+    WHERE reference_id = %s
+    """
+    return querylog.sql(sql, reference_id, as_dict=True)[0]
+
+
+def get_transfer_in_totals(reference_id):
+    sql = """
+    SELECT COUNT(DISTINCT crate_id) AS done, ROUND(IFNULL(SUM(grn_quantity), 0),2) AS grn_quantity, ROUND(IFNULL(SUM(crate_weight), 0),2) AS weight, ROUND(IFNULL(SUM(moisture_loss), 0), 2) AS moisture, ROUND(IFNULL(SUM(actual_loss), 0), 2) AS actual_loss
+    FROM `tabCrate Activity`
+    WHERE linked_reference_id = %s
+    """
+    return querylog.sql(sql, reference_id, as_dict=True)[0]
+
+
+def get_transfer_manifest_values(reference_id, expected=True, received=True):
+    values = {}
+    if expected:
+        transfer_out = get_transfer_out_totals(reference_id)
+        values.update(
+            {
+                "expected_crates": transfer_out["expected"],
+                "source_warehouse": transfer_out["source_warehouse"],
+                "target_warehouse": transfer_out["target_warehouse"],
+            }
+        )
+    if received:
+        transfer_in = get_transfer_in_totals(reference_id)
+        values.update(
+            {
+                "received_crates": transfer_in["done"],
+                "received_grn_quantity": transfer_in["grn_quantity"],
+                "received_weight": transfer_in["weight"],
+                "received_moisture": transfer_in["moisture"],
+                "received_actual_loss": transfer_in["actual_loss"],
+            }
+        )
+    return values
+
+
+def refresh_transfer_manifest(reference_id, expected=True, received=True):
+    """
+    Recomputes the counters of a single Transfer Manifest from its own activities.
+    Only rows for this reference_id are read, never the whole activity table.
+    """
+    values = get_transfer_manifest_values(reference_id, expected, received)
+    if frappe.db.exists("Transfer Manifest", reference_id):
+        frappe.db.set_value("Transfer Manifest", reference_id, values)
+        return
+    doc = frappe.new_doc("Transfer Manifest")
+    doc.reference_id = reference_id
+    doc.update(values)
+    try:
+        doc.insert(ignore_permissions=True)
+    except frappe.DuplicateEntryError:
+        # Another scanner created it in the meantime
+        frappe.db.set_value("Transfer Manifest", reference_id, values)
+
+
+def refresh_pending_transfer_outs():
+    for reference_id in frappe.flags.pop("godesi_pending_transfer_outs", set()):
+        refresh_transfer_manifest(reference_id, received=False)
+
+
+def defer_transfer_out_refresh(reference_id):
+    # Submitting or deleting a Transfer Out touches every crate row, so count them once before commit
+    if not frappe.flags.get("godesi_pending_transfer_outs"):
+        frappe.flags.godesi_pending_transfer_outs = set()
+        frappe.db.before_commit.add(refresh_pending_transfer_outs)
+    frappe.flags.godesi_pending_transfer_outs.add(reference_id)
+
+
+def crate_activity_on_update(doc, event=None):
+    if doc.activity in TRANSFER_IN_ACTIVITIES and doc.linked_reference_id:
+        # Refreshed right away as the scan response reads the manifest in the same request
+        refresh_transfer_manifest(doc.linked_reference_id, expected=False)
+    elif doc.activity in TRANSFER_OUT_ACTIVITIES and doc.reference_id and doc.status == "Completed":
+        defer_transfer_out_refresh(doc.reference_id)
+
+
+def crate_activity_after_delete(doc, event=None):
+    if doc.activity in TRANSFER_IN_ACTIVITIES and doc.linked_reference_id:
+        refresh_transfer_manifest(doc.linked_reference_id, expected=False)
+    elif doc.activity in TRANSFER_OUT_ACTIVITIES and doc.reference_id and doc.status == "Completed":
+        defer_transfer_out_refresh(doc.reference_id)
+
+
+def build_missing_transfer_manifests(page_size=BUILD_PAGE_SIZE):
+    """
+    Creates the Transfer Manifest of every transfer that predates the table, a page of references at a time.
+    Run by a patch on migrate; safe to repeat.
+    """
+    sql = """
+    SELECT DISTINCT ca.reference_id
+    FROM `tabCrate Activity` ca
+    LEFT JOIN `tabTransfer Manifest` tm ON tm.name = ca.reference_id
+    WHERE ca.activity IN %(activities)s AND ca.reference_id > %(after)s AND tm.name IS NULL
+    ORDER BY ca.reference_id ASC
+    LIMIT %(page_size)s
+    """
+    after = ""
+    built = 0
+    while True:
+        reference_ids = [
+            row[0] for row in frappe.db.sql(sql, {"activities": TRANSFER_OUT_ACTIVITIES, "after": after, "page_size": page_size})
+        ]
+        if not reference_ids:
+            break
+        for reference_id in reference_ids:
+            refresh_transfer_manifest(reference_id)
+        frappe.db.commit()
+        built += len(reference_ids)
+        after = reference_ids[-1]
+    return built
+
+
+def get_transfer_manifests(reference_ids):
+    """
+    Returns one row per manifest. Manifests not built yet are computed from their activities.
+    """
+    if not reference_ids:
+        return []
+    fields = [
+        "reference_id",
+        "expected_crates",
+        "received_crates",
+        "received_grn_quantity",
+        "received_weight",
+        "received_moisture",
+        "received_actual_loss",
+    ]
+    manifests = frappe.get_all(
+        "Transfer Manifest",
+        filters={"reference_id": ["in", reference_ids]},
+        fields=fields,
+    )
+    # Manifests missing from the table are computed, never written, so reads stay reads
+    for reference_id in set(reference_ids) - {row["reference_id"] for row in manifests}:
+        row = get_transfer_manifest_values(reference_id)
+        row["reference_id"] = reference_id
+        manifests.append({field: row[field] for field in fields})
+    return manifests
+
+
+def get_session_manifest_summary(session_id):
+    sql = """
+    SELECT DISTINCT linked_reference_id
+    FROM `tabCrate Activity`
+    WHERE session_id = %s AND linked_reference_id IS NOT NULL
+    """
+    reference_ids = [r[0] for r in querylog.sql(sql, session_id)]
+    manifests = get_transfer_manifests(reference_ids)
+    if not manifests:
+        return None
+    expected = sum([row["expected_crates"] for row in manifests])
+    done = sum([row["received_crates"] for row in manifests])
+    return {
+        "expected": expected,
+        "pending": expected - done,
+        "done": done,
+        "grn_quantity": round(sum([row["received_grn_quantity"] for row in manifests]), 2),
+        "weight": round(sum([row["received_weight"] for row in manifests]), 2),
+        "moisture": round(sum([row["received_moisture"] for row in manifests]), 2),
+        "actual_loss": round(sum([row["received_actual_loss"] for row in manifests]), 2),
+    }
@@ -0,0 +1,7 @@
+import frappe
+
+
+def execute():
+    # Transfer Manifest counters are recomputed per reference, which needs these lookups indexed
+    frappe.db.add_index("Crate Activity", ["reference_id"])
+    frappe.db.add_index("Crate Activity", ["linked_reference_id"])
@@ -0,0 +1,5 @@
+from iotready_godesi import recalls
+
+
+def execute():
+    recalls.backfill_batch_crates()
@@ -0,0 +1,6 @@
+from iotready_godesi import manifests
+
+
+def execute():
+    # Reads no longer build missing manifests, so transfers that predate the table are built here once
+    manifests.build_missing_transfer_manifests()
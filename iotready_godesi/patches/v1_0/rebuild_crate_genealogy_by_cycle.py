@@ -0,0 +1,5 @@
+from iotready_godesi import genealogy
+
+
+def execute():
+    genealogy.rebuild_genealogy()
@@ -0,0 +1,8 @@
+import frappe
+from iotready_godesi import exports
+
+
+def execute():
+    # Earlier exports read only the hot table, so archived rows behind the watermark were never written.
+    # Starting over re-exports everything; readers already keep the latest `modified` per `name`.
+    frappe.defaults.clear_default(exports.WATERMARK_KEY.format(dataset="crate_activity"), parent="__global")
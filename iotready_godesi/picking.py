@@ -1,11 +1,10 @@
 import frappe
 from datetime import datetime, timedelta
-from iotready_godesi import utils, validations
+from iotready_godesi import replica, utils, validations
 from frappe.utils import now
-from erpnext.selling.doctype.sales_order.sales_order import make_sales_invoice
-from erpnext.stock.doctype.pick_list.pick_list import create_delivery_note
 
 
+@replica.read_only
 def get_picklists():
     """
     Returns a list of picklists for the user's warehouse.
@@ -28,20 +27,26 @@ def get_picklists():
         picklists.append(picklist)
     return picklists    
 def get_sales_docs(picklist):
-    sales_docs = []
-    processed_sales_orders = set()
-    locations = picklist.get('locations', [])
-    for location in locations:
+    sales_order_refs = []
+    for location in picklist.get('locations', []):
         sales_order_ref = location.get('sales_order')
-        if sales_order_ref and sales_order_ref not in processed_sales_orders:
-            sales_order = frappe.get_doc("Sales Order", sales_order_ref)
-            so_data = {"po_no": sales_order.po_no, "shipping_address_name": sales_order.shipping_address_name}
-            #sales_docs.append(sales_order.as_json())
-            sales_docs.append(so_data)
-            print(sales_order)
-            processed_sales_orders.add(sales_order_ref)
-        else:
-            print("Sales Order name is None or done. Skipping...")
+        if sales_order_ref and sales_order_ref not in sales_order_refs:
+            sales_order_refs.append(sales_order_ref)
+    if not sales_order_refs:
+        return []
+    sales_orders = {
+        so.name: so
+        for so in frappe.get_all(
+            "Sales Order",
+            filters={"name": ["in", sales_order_refs]},
+            fields=["name", "po_no", "shipping_address_name"],
+        )
+    }
+    sales_docs = []
+    for sales_order_ref in sales_order_refs:
+        sales_order = sales_orders.get(sales_order_ref)
+        if sales_order:
+            sales_docs.append({"po_no": sales_order.po_no, "shipping_address_name": sales_order.shipping_address_name})
     return sales_docs
 
 
@@ -52,22 +57,21 @@ def get_picklist_summary(picklist_id):
 
 
 def get_package_ids(picklist_ids):
-    payload = {}
-    for picklist_id in picklist_ids:
-        package_ids = list(
-            {
-                r.package_id
-                for r in frappe.get_all(
-                    "Crate Activity",
-                    filters={
-                        "activity": "Customer Picking",
-                        "picklist_id": picklist_id,
-                    },
-                    fields=["package_id"],
-                )
-            }
-        )
-        payload[picklist_id] = package_ids
+    payload = {picklist_id: [] for picklist_id in picklist_ids}
+    if not picklist_ids:
+        return payload
+    rows = frappe.get_all(
+        "Crate Activity",
+        filters={
+            "activity": "Customer Picking",
+            "picklist_id": ["in", picklist_ids],
+        },
+        fields=["picklist_id", "package_id"],
+        distinct=True,
+    )
+    for r in rows:
+        if r.package_id not in payload[r.picklist_id]:
+            payload[r.picklist_id].append(r.package_id)
     return payload
 
 
@@ -103,12 +107,16 @@ def mark_as_complete(picklist_id, note=None):
         todo.status = "Closed"
         todo.save()
     maybe_create_delivery_note(picklist_id)
+    replica.mark_write()
     return True
 
 
 def maybe_create_delivery_note(picklist_id):
     dn = frappe.get_all("Delivery Note", filters={"pick_list": picklist_id})
     if not dn:
+        # Imported on use, like doc_hooks.make_stock_entry
+        from erpnext.stock.doctype.pick_list.pick_list import create_delivery_note
+
         doc = create_delivery_note(picklist_id)
         # frappe.db.commit()
         if doc:
@@ -119,6 +127,7 @@ def maybe_create_delivery_note(picklist_id):
     
 
 # def create_sales_invoice(picklist_id):
+#     from erpnext.selling.doctype.sales_order.sales_order import make_sales_invoice
 #     picklist = frappe.get_doc("Pick List", picklist_id)
 #     sales_orders = {}
 #     for row in picklist.locations:
@@ -80,6 +80,15 @@ window.constructSummaryView = (context) => new Vue({
     },
   },
   mounted() {
+    // Scan batches are pushed here by webutils.publish_session_summary, no need to poll
+    if (frappe.realtime) {
+      frappe.realtime.task_subscribe(`godesi-session-${context.session_id}`);
+      frappe.realtime.on("godesi_session_summary", (data) => {
+        if (data && data.session_id === this.session_id) {
+          this.update(data.summary);
+        }
+      });
+    }
   },
 })
 
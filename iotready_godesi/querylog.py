@@ -0,0 +1,170 @@
+import frappe
+import hashlib
+import json
+import redis
+import sys
+import time
+from frappe.utils import now_datetime
+
+# Queries slower than this are recorded with their EXPLAIN plan.
+# Override per site with `"godesi_slow_query_ms": 250` in site_config.json; 0 disables capture.
+THRESHOLD_CONFIG_KEY = "godesi_slow_query_ms"
+DEFAULT_THRESHOLD_MS = 500
+# Rows kept in Go Desi Slow Query, ranked by total time
+TOP_N_CONFIG_KEY = "godesi_slow_query_top_n"
+DEFAULT_TOP_N = 50
+# Captures are aggregated in Redis and written by flush_slow_queries,
+# so nothing is written on the request path and GET requests are covered too.
+# One hash holds every pending query, as "<query_hash>:<field>" fields.
+PENDING_KEY = "godesi:slow_queries"
+FLUSHING_TTL = 24 * 60 * 60
+SLOW_QUERY_DOCTYPE = "Go Desi Slow Query"
+# Sets the slowest-run fields only if this run is at least as slow as the stored maximum
+SET_MAX_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], ARGV[1] .. ':max_time_ms') or '-1')
+if tonumber(ARGV[2]) >= current then
+    redis.call('HSET', KEYS[1], ARGV[1] .. ':max_time_ms', ARGV[2])
+    redis.call('HSET', KEYS[1], ARGV[1] .. ':last_values', ARGV[3])
+    redis.call('HSET', KEYS[1], ARGV[1] .. ':explain', ARGV[4])
+end
+return 0
+"""
+
+
+def get_threshold_ms():
+    return frappe.conf.get(THRESHOLD_CONFIG_KEY, DEFAULT_THRESHOLD_MS)
+
+
+def normalize(query):
+    return " ".join(query.split())
+
+
+def get_query_hash(query):
+    return hashlib.md5(normalize(query).encode()).hexdigest()
+
+
+def get_caller(depth=2):
+    frame = sys._getframe(depth)
+    return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}"
+
+
+def sql(query, values=(), *args, **kwargs):
+    """
+    Drop-in for frappe.db.sql that records the query when it runs slower than the threshold.
+    """
+    threshold_ms = get_threshold_ms()
+    start = time.perf_counter()
+    result = frappe.db.sql(query, values, *args, **kwargs)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if threshold_ms and elapsed_ms >= threshold_ms:
+        try:
+            record(query, values, elapsed_ms, get_caller())
+        except Exception:
+            frappe.logger("iotready_godesi").exception("Could not record slow query")
+    return result
+
+
+def explain(query, values):
+    if not query.strip().upper().startswith(("SELECT", "WITH")):
+        return []
+    return frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True)
+
+
+def get_field(query_hash, name):
+    return f"{query_hash}:{name}"
+
+
+def record(query, values, elapsed_ms, caller):
+    """
+    Adds one run of `query` to its pending entry. Counters are incremented in Redis, so concurrent workers
+    never overwrite each other's counts.
+    """
+    query_hash = get_query_hash(query)
+    cache = frappe.cache()
+    key = cache.make_key(PENDING_KEY)
+    pipe = cache.pipeline()
+    pipe.hincrby(key, get_field(query_hash, "calls"), 1)
+    pipe.hincrbyfloat(key, get_field(query_hash, "total_time_ms"), elapsed_ms)
+    pipe.hsetnx(key, get_field(query_hash, "query"), normalize(query))
+    pipe.hset(key, get_field(query_hash, "caller"), caller)
+    pipe.hset(key, get_field(query_hash, "last_seen"), str(now_datetime()))
+    pipe.execute()
+    # Keep the parameters and plan of the slowest run; EXPLAIN is only re-run when a new maximum is hit
+    max_time_ms = cache.execute_command("HGET", key, get_field(query_hash, "max_time_ms"))
+    if max_time_ms is None or elapsed_ms >= float(max_time_ms):
+        cache.eval(
+            SET_MAX_SCRIPT,
+            1,
+            key,
+            query_hash,
+            elapsed_ms,
+            json.dumps(values, default=str),
+            json.dumps(explain(query, values), default=str),
+        )
+
+
+def take_pending(cache):
+    """
+    Moves the pending entries aside with an atomic RENAME and returns them as {query_hash: {field: value}}.
+    Runs recorded after the rename go to a fresh hash and wait for the next flush.
+    """
+    key = cache.make_key(PENDING_KEY)
+    flushing_key = cache.make_key(f"{PENDING_KEY}:flushing:{frappe.generate_hash(length=10)}")
+    try:
+        cache.execute_command("RENAME", key, flushing_key)
+    except redis.exceptions.ResponseError:
+        # Nothing captured since the last flush
+        return None, {}
+    # Left behind only if the flush fails; keeps a crashed flush from leaking the hash
+    cache.execute_command("EXPIRE", flushing_key, FLUSHING_TTL)
+    entries = {}
+    for field, value in cache.execute_command("HGETALL", flushing_key).items():
+        query_hash, _, name = frappe.safe_decode(field).partition(":")
+        if not name:
+            # An entry in the format used before fields were split out; its counts cannot be merged
+            continue
+        entries.setdefault(query_hash, {})[name] = frappe.safe_decode(value)
+    return flushing_key, entries
+
+
+def flush_slow_queries():
+    """
+    Scheduled. Merges the captured queries into Go Desi Slow Query and trims it to the top N by total time.
+    """
+    cache = frappe.cache()
+    flushing_key, pending = take_pending(cache)
+    if not pending:
+        return
+    for query_hash, entry in pending.items():
+        calls = int(entry.get("calls", 0))
+        if frappe.db.exists(SLOW_QUERY_DOCTYPE, query_hash):
+            doc = frappe.get_doc(SLOW_QUERY_DOCTYPE, query_hash)
+        elif calls:
+            doc = frappe.new_doc(SLOW_QUERY_DOCTYPE)
+            doc.query_hash = query_hash
+            doc.query = entry["query"]
+        else:
+            # Only the slowest-run fields of a run whose counters went to the previous flush
+            continue
+        if calls:
+            doc.caller = entry["caller"]
+            doc.calls = (doc.calls or 0) + calls
+            doc.total_time_ms = (doc.total_time_ms or 0) + float(entry["total_time_ms"])
+            doc.avg_time_ms = doc.total_time_ms / doc.calls
+            doc.last_seen = entry["last_seen"]
+        if "max_time_ms" in entry and float(entry["max_time_ms"]) >= (doc.max_time_ms or 0):
+            doc.max_time_ms = float(entry["max_time_ms"])
+            doc.last_values = entry["last_values"]
+            doc.explain = entry["explain"]
+        doc.save(ignore_permissions=True)
+    top_n = frappe.conf.get(TOP_N_CONFIG_KEY, DEFAULT_TOP_N)
+    keep = frappe.get_all(
+        SLOW_QUERY_DOCTYPE,
+        order_by="total_time_ms desc",
+        limit_page_length=top_n,
+        pluck="name",
+    )
+    if keep:
+        frappe.db.delete(SLOW_QUERY_DOCTYPE, {"name": ["not in", keep]})
+    frappe.db.commit()
+    cache.execute_command("DEL", flushing_key)
@@ -0,0 +1,185 @@
+import frappe
+import hashlib
+from frappe.utils import get_datetime, now_datetime
+from iotready_godesi import genealogy, replica
+
+# `tabGoDesi Batch Crate` maps each batch to the crates labelled under it, so a recall is an indexed
+# lookup instead of a scan of activity history. Rows are written when labels are printed;
+# reprinting a label keeps the row and moves its `modified`, the time the crate was last labelled.
+# Crate IDs are reused, so a recall follows each crate only through the cycle it was labelled in.
+BACKFILL_PAGE_SIZE = 1000
+
+
+def get_batch_crate_name(batch_id, crate_id):
+    return hashlib.md5(f"{batch_id}|{crate_id}".encode()).hexdigest()
+
+
+def insert_batch_crates(rows):
+    """
+    `rows` are (batch_id, crate_id, warehouse, item_code, labelled_on).
+    """
+    if not rows:
+        return
+    user = frappe.session.user
+    values = []
+    for batch_id, crate_id, warehouse, item_code, labelled_on in rows:
+        values += [get_batch_crate_name(batch_id, crate_id), labelled_on, labelled_on, user, user, batch_id, crate_id, warehouse, item_code]
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, 0, 0, %s, %s, %s, %s)"] * len(rows))
+    frappe.db.sql(
+        f"""
+        INSERT INTO `tabGoDesi Batch Crate`
+            (name, creation, modified, owner, modified_by, docstatus, idx, batch_id, crate_id, warehouse, item_code)
+        VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE modified = VALUES(modified)
+        """,
+        values,
+    )
+
+
+def index_batch_crates(batch_id, warehouse_id, crates):
+    """
+    Records that `crates`, a list of (crate_id, item_code), were labelled under `batch_id` now.
+    """
+    labelled_on = now_datetime()
+    insert_batch_crates([(batch_id, crate_id, warehouse_id, item_code, labelled_on) for crate_id, item_code in crates])
+
+
+def get_cycle_activities(batch_id):
+    """
+    Activities of the batch's crates from shortly before the batch was first labelled, in the hot table
+    and the archive, oldest first. Earlier cycles of the same crate IDs cannot belong to the batch.
+    """
+    queries = [
+        f"""
+        SELECT ca.name, ca.crate_id, ca.activity, ca.status, ca.creation, ca.source_warehouse, ca.target_warehouse,
+            ca.grn_quantity, ca.crate_weight
+        FROM `{table}` ca
+        JOIN (
+            SELECT crate_id, DATE_SUB(MIN(creation), INTERVAL 1 DAY) AS since
+            FROM `tabGoDesi Batch Crate`
+            WHERE batch_id = %(batch_id)s
+            GROUP BY crate_id
+        ) bc ON bc.crate_id = ca.crate_id AND ca.creation >= bc.since
+        """
+        for table in genealogy.get_activity_tables()
+    ]
+    return frappe.db.sql(
+        " UNION ALL ".join(queries) + " ORDER BY creation ASC, name ASC", {"batch_id": batch_id}, as_dict=True
+    )
+
+
+def get_labelled_cycle(activities, labelled_on):
+    """
+    (cycle start, activities of the cycle, whether the crate was reused since) for a crate labelled at
+    `labelled_on`: the cycle running then or, for a crate labelled before it was procured, the first one after.
+    """
+    starts = [a for a in activities if a.activity in genealogy.CYCLE_ACTIVITIES]
+    started = [a for a in starts if a.creation <= labelled_on]
+    start = started[-1] if started else next(iter(starts), None)
+    if not start:
+        return None, [], False
+    later = [a for a in starts if a.creation > start.creation]
+    end = later[0].creation if later else None
+    cycle = [a for a in activities if a.creation >= start.creation and (end is None or a.creation < end)]
+    return start, cycle, bool(later)
+
+
+@replica.read_only
+def get_batch_recall(batch_id):
+    """
+    Every crate labelled under `batch_id` with where it is now, and the crates and packages split or picked
+    from it, both limited to the crate's cycle under this batch. A crate reused since reports where its
+    cycle ended instead of its current state.
+    """
+    crates = frappe.db.sql(
+        """
+        SELECT bc.crate_id, bc.item_code, bc.warehouse AS labelled_at, bc.modified AS labelled_on,
+            c.last_known_warehouse, c.last_known_grn_quantity, c.last_known_weight
+        FROM `tabGoDesi Batch Crate` bc
+        LEFT JOIN `tabCrate` c ON c.name = bc.crate_id
+        WHERE bc.batch_id = %s
+        ORDER BY bc.crate_id ASC
+        """,
+        batch_id,
+        as_dict=True,
+    )
+    activities = {}
+    for activity in get_cycle_activities(batch_id):
+        activities.setdefault(activity.crate_id, []).append(activity)
+    nodes = {}
+    for crate in crates:
+        crate_activities = activities.get(crate.crate_id, [])
+        start, cycle, reused = get_labelled_cycle(crate_activities, get_datetime(crate.labelled_on))
+        completed = [a for a in cycle if a.status == "Completed"]
+        crate["cycle"] = start.name if start else None
+        crate["reused"] = reused
+        if reused and completed:
+            last = completed[-1]
+            crate["current_warehouse"] = last.target_warehouse or last.source_warehouse
+            crate["quantity"] = last.grn_quantity
+            crate["weight"] = last.crate_weight
+        else:
+            crate["current_warehouse"] = crate.last_known_warehouse
+            crate["quantity"] = crate.last_known_grn_quantity
+            crate["weight"] = crate.last_known_weight
+        for field in ["last_known_warehouse", "last_known_grn_quantity", "last_known_weight"]:
+            crate.pop(field)
+        crate["downstream"] = []
+        if start:
+            nodes[genealogy.get_cycle_node(crate.crate_id, start.name)] = crate
+    if nodes:
+        descendants = frappe.db.sql(
+            """
+            SELECT ancestor, descendant, descendant_crate_id, descendant_type, depth
+            FROM `tabCrate Genealogy`
+            WHERE ancestor IN %(nodes)s
+            ORDER BY depth ASC, descendant ASC
+            """,
+            {"nodes": list(nodes)},
+            as_dict=True,
+        )
+        for row in descendants:
+            nodes[row.ancestor]["downstream"].append(
+                {"id": row.descendant, "crate_id": row.descendant_crate_id, "type": row.descendant_type, "depth": row.depth}
+            )
+    return {"batch_id": batch_id, "crates": crates}
+
+
+def get_procurement_page(table, after, page_size):
+    sql = f"""
+    SELECT name, crate_id, item_code, source_warehouse, creation
+    FROM `{table}`
+    WHERE activity = 'Procurement' AND status = 'Completed'
+        AND (creation > %(creation)s OR (creation = %(creation)s AND name > %(name)s))
+    ORDER BY creation ASC, name ASC
+    LIMIT %(page_size)s
+    """
+    return frappe.db.sql(
+        sql, {"creation": after[0], "name": after[1], "page_size": page_size}, as_dict=True
+    )
+
+
+def backfill_batch_crates(page_size=BACKFILL_PAGE_SIZE):
+    """
+    Indexes crates procured before the index existed, from the archive and the hot table a page at a time.
+    Labels carry the batch of the warehouse and day of procurement, so each Procurement activity maps to the
+    batch of its source warehouse on its creation date. Only batches that exist are indexed.
+    """
+    batches = {
+        (row.warehouse, row.manufacturing_date): row.name
+        for row in frappe.get_all("GoDesi Batch", fields=["name", "warehouse", "manufacturing_date"], limit_page_length=0)
+    }
+    for table in reversed(genealogy.get_activity_tables()):
+        after = ("1970-01-01", "")
+        while True:
+            activities = get_procurement_page(table, after, page_size)
+            if not activities:
+                break
+            rows = []
+            for activity in activities:
+                batch_id = batches.get((activity.source_warehouse, activity.creation.date()))
+                if batch_id:
+                    rows.append((batch_id, activity.crate_id, activity.source_warehouse, activity.item_code, activity.creation))
+            insert_batch_crates(rows)
+            after = (activities[-1].creation, activities[-1].name)
+            frappe.db.commit()
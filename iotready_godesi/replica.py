@@ -0,0 +1,119 @@
+import frappe
+import functools
+import inspect
+import time
+
+# Read-only paths run on the replica when site_config.json has `read_from_replica` and `replica_host`
+# (the same keys frappe.read_only uses). Writes always stay on the primary.
+# Reads for a session or user that wrote within this many seconds go to the primary, so a scanner
+# never sees a summary that misses its own last scan because of replication lag.
+LAG_GUARD_CONFIG_KEY = "godesi_replica_lag_guard_seconds"
+DEFAULT_LAG_GUARD_SECONDS = 10
+# After a failed connection the replica is skipped for this long, per worker
+RETRY_AFTER_SECONDS = 60
+
+replica_down_until = 0
+
+
+def get_lag_guard_seconds():
+    return frappe.conf.get(LAG_GUARD_CONFIG_KEY, DEFAULT_LAG_GUARD_SECONDS)
+
+
+def get_write_keys(session_id=None):
+    keys = [f"godesi:recent_write:user:{frappe.session.user}"]
+    if session_id:
+        keys.append(f"godesi:recent_write:session:{session_id}")
+    return keys
+
+
+def mark_write(session_id=None):
+    """
+    Records that the current user (and session) just wrote, for the lag guard.
+    """
+    if not frappe.conf.get("read_from_replica"):
+        return
+    for key in get_write_keys(session_id):
+        frappe.cache().set_value(key, 1, expires_in_sec=get_lag_guard_seconds())
+
+
+def has_recent_write(session_id=None):
+    return any(frappe.cache().get_value(key) for key in get_write_keys(session_id))
+
+
+def is_active():
+    replica = getattr(frappe.local, "replica_db", None)
+    return replica is not None and frappe.local.db is replica
+
+
+def use_replica(session_id=None):
+    if not frappe.conf.get("read_from_replica") or not frappe.conf.get("replica_host"):
+        return False
+    if replica_down_until > time.time():
+        return False
+    return not has_recent_write(session_id)
+
+
+def switch_to_replica():
+    """
+    Points frappe.db at the replica and returns True, or leaves it on the primary and returns False
+    when the replica cannot be reached.
+    """
+    global replica_down_until
+    primary = frappe.local.db
+    try:
+        if getattr(frappe.local, "replica_db", None) is None:
+            frappe.connect_replica()
+        else:
+            frappe.local.db = frappe.local.replica_db
+        # Connections are opened lazily, so make sure this one works before running the real queries
+        frappe.db.sql("SELECT 1")
+        return True
+    except Exception:
+        replica_db = getattr(frappe.local, "replica_db", None)
+        frappe.local.db = primary
+        if replica_db is not None and replica_db is not primary:
+            try:
+                replica_db.close()
+            except Exception:
+                # The connection may never have opened; there is nothing left to release then
+                pass
+        # Lets frappe.connect_replica try again once the retry window has passed
+        for attr in ["replica_db", "primary_db"]:
+            if hasattr(frappe.local, attr):
+                delattr(frappe.local, attr)
+        replica_down_until = time.time() + RETRY_AFTER_SECONDS
+        frappe.logger("iotready_godesi").exception("Replica unavailable, reading from primary")
+        return False
+
+
+def get_session_id(signature, session_arg, args, kwargs):
+    if not session_arg:
+        return None
+    try:
+        return signature.bind_partial(*args, **kwargs).arguments.get(session_arg)
+    except TypeError:
+        return None
+
+
+def read_only(fn=None, session_arg=None):
+    """
+    Runs a read-only function on the replica when one is configured and reachable.
+    `session_arg` names the argument holding the session_id used by the lag guard.
+    """
+    if fn is None:
+        return functools.partial(read_only, session_arg=session_arg)
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if is_active() or not use_replica(get_session_id(signature, session_arg, args, kwargs)):
+            return fn(*args, **kwargs)
+        primary = frappe.local.db
+        if not switch_to_replica():
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            frappe.local.db = primary
+
+    return wrapper
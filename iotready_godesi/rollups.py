@@ -0,0 +1,135 @@
+import frappe
+from datetime import datetime, timedelta
+from frappe.utils import get_datetime, getdate, now_datetime
+from iotready_godesi import genealogy, replica
+
+HOURLY = "Go Desi Hourly Throughput"
+DAILY = "Go Desi Daily Throughput"
+WATERMARK_KEY = "godesi_throughput_watermark"
+# Rows modified in the last few minutes may still belong to open transactions, so they wait for the next run
+SAFETY_LAG_MINUTES = 5
+# Bounds a single run, e.g. the first backfill over the whole history
+MAX_WINDOW_DAYS = 7
+
+# Transfer In counts at the receiving warehouse, everything else at the source
+WAREHOUSE_SQL = "CASE WHEN activity = 'Transfer In' THEN target_warehouse ELSE source_warehouse END"
+ACTIVITY_COLUMNS = "creation, modified, status, activity, source_warehouse, target_warehouse, grn_quantity, crate_weight, moisture_loss, actual_loss"
+
+
+def get_activities_sql(condition):
+    """
+    Activities matching `condition` in the hot table and the archive. Earlier crate cycles are archived
+    whatever their age, so any hour may be split across both.
+    """
+    return " UNION ALL ".join(
+        f"SELECT {ACTIVITY_COLUMNS} FROM `{table}` WHERE {condition}" for table in genealogy.get_activity_tables()
+    )
+
+
+def get_watermark():
+    watermark = frappe.db.get_global(WATERMARK_KEY)
+    if watermark:
+        return get_datetime(watermark)
+    # Start from the oldest row in either table, so the first run backfills archived history too
+    firsts = [frappe.db.sql(f"SELECT MIN(modified) FROM `{table}`")[0][0] for table in genealogy.get_activity_tables()]
+    first = min([first for first in firsts if first], default=None)
+    return first - timedelta(seconds=1) if first else None
+
+
+def get_changed_hours(start, end):
+    """
+    Hours (by creation) holding any activity modified in (start, end]. Only these buckets are recomputed.
+    """
+    sql = f"""
+    SELECT DISTINCT DATE_FORMAT(creation, '%%Y-%%m-%%d %%H:00:00')
+    FROM ({get_activities_sql("modified > %(start)s AND modified <= %(end)s")}) activities
+    """
+    return sorted(get_datetime(row[0]) for row in frappe.db.sql(sql, {"start": start, "end": end}))
+
+
+def recompute_hour(hour):
+    frappe.db.sql("DELETE FROM `tabGo Desi Hourly Throughput` WHERE period_start = %s", hour)
+    frappe.db.sql(
+        f"""
+        INSERT INTO `tabGo Desi Hourly Throughput`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+            period_start, warehouse, activity, crates, quantity, weight, moisture_loss, actual_loss)
+        SELECT MD5(CONCAT_WS('|', %(hour)s, warehouse, activity)), NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+            %(hour)s, warehouse, activity, crates, quantity, weight, moisture_loss, actual_loss
+        FROM (
+            SELECT {WAREHOUSE_SQL} AS warehouse, activity, COUNT(*) AS crates,
+                IFNULL(SUM(grn_quantity), 0) AS quantity, IFNULL(SUM(crate_weight), 0) AS weight,
+                IFNULL(SUM(moisture_loss), 0) AS moisture_loss, IFNULL(SUM(actual_loss), 0) AS actual_loss
+            FROM ({get_activities_sql("creation >= %(hour)s AND creation < %(next_hour)s AND status = 'Completed'")}) activities
+            GROUP BY 1, 2
+        ) buckets
+        WHERE warehouse IS NOT NULL
+        """,
+        {"hour": hour, "next_hour": hour + timedelta(hours=1)},
+    )
+
+
+def recompute_day(day):
+    # Every column is a count or a sum, so days add up from the hourly rollup without touching activities
+    frappe.db.sql("DELETE FROM `tabGo Desi Daily Throughput` WHERE period_start = %s", day)
+    frappe.db.sql(
+        """
+        INSERT INTO `tabGo Desi Daily Throughput`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+            period_start, warehouse, activity, crates, quantity, weight, moisture_loss, actual_loss)
+        SELECT MD5(CONCAT_WS('|', %(day)s, warehouse, activity)), NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+            %(day)s, warehouse, activity, SUM(crates), SUM(quantity), SUM(weight), SUM(moisture_loss), SUM(actual_loss)
+        FROM `tabGo Desi Hourly Throughput`
+        WHERE period_start >= %(day)s AND period_start < %(next_day)s
+        GROUP BY warehouse, activity
+        """,
+        {"day": day, "next_day": day + timedelta(days=1)},
+    )
+
+
+def update_throughput_rollups():
+    """
+    Scheduled. Recomputes the hourly and daily buckets touched by activities modified since the watermark,
+    then moves the watermark. Deleted Completed activities are only picked up when their bucket changes again.
+    """
+    start = get_watermark()
+    if start is None:
+        return {"hours": 0, "days": 0}
+    end = min(now_datetime() - timedelta(minutes=SAFETY_LAG_MINUTES), start + timedelta(days=MAX_WINDOW_DAYS))
+    if end <= start:
+        return {"hours": 0, "days": 0}
+    hours = get_changed_hours(start, end)
+    for hour in hours:
+        recompute_hour(hour)
+    days = sorted({hour.date() for hour in hours})
+    for day in days:
+        recompute_day(datetime.combine(day, datetime.min.time()))
+    frappe.db.set_global(WATERMARK_KEY, str(end))
+    frappe.db.commit()
+    return {"hours": len(hours), "days": len(days)}
+
+
+@replica.read_only
+def get_throughput(from_date, to_date, period="Daily", warehouse=None, activity=None):
+    """
+    Rolled up crates, quantity, weight, moisture loss and actual loss per warehouse and activity,
+    for each hour or day from `from_date` to `to_date` inclusive. Never reads Crate Activity or its archive.
+    """
+    assert period in ["Hourly", "Daily"], "Period must be Hourly or Daily."
+    filters = {"period_start": ["between", [getdate(from_date), getdate(to_date)]]}
+    if period == "Hourly":
+        filters["period_start"] = [
+            "between",
+            [get_datetime(getdate(from_date)), get_datetime(getdate(to_date)) + timedelta(hours=23)],
+        ]
+    if warehouse:
+        filters["warehouse"] = warehouse
+    if activity:
+        filters["activity"] = activity
+    return frappe.get_all(
+        HOURLY if period == "Hourly" else DAILY,
+        filters=filters,
+        fields=["period_start", "warehouse", "activity", "crates", "quantity", "weight", "moisture_loss", "actual_loss"],
+        order_by="period_start asc, warehouse asc, activity asc",
+        limit_page_length=0,
+    )
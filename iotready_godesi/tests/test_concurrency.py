@@ -0,0 +1,57 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+import json
+import uuid
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from iotready_godesi import api, concurrency, loadtest, validations, webutils
+
+
+class TestConcurrency(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        frappe.set_user("Administrator")
+        loadtest.seed_master_data(handhelds=1)
+        cls.user = loadtest.get_user("source", 0)
+
+    def tearDown(self):
+        frappe.set_user("Administrator")
+
+    def new_crate(self):
+        crate_id = f"CC-{uuid.uuid4().hex[:10].upper()}"
+        validations.maybe_create_crate(crate_id)
+        return crate_id
+
+    def test_claim_moves_version(self):
+        crate_id = self.new_crate()
+        version = concurrency.get_crate_version(crate_id)
+        self.assertEqual(concurrency.claim_crate(crate_id, version), version + 1)
+        self.assertEqual(concurrency.get_crate_version(crate_id), version + 1)
+
+    def test_stale_claim_is_rejected(self):
+        crate_id = self.new_crate()
+        version = concurrency.get_crate_version(crate_id)
+        concurrency.claim_crate(crate_id, version)
+        with self.assertRaises(concurrency.CrateConflictError):
+            concurrency.claim_crate(crate_id, version)
+
+    def test_losing_scan_is_rejected_without_activity(self):
+        frappe.set_user(self.user)
+        session_id = api.get_new_activity_session("Procurement")["session_id"]
+        api.update_activity_session(
+            session_id, json.dumps({"supplier": loadtest.SUPPLIER, "item_code": loadtest.ITEM_CODE})
+        )
+        crate_id = self.new_crate()
+        # Another device claims the crate between this scan's validation and its write
+        stale_version = concurrency.get_crate_version(crate_id) - 1
+        with patch.object(concurrency, "get_crate_version", return_value=stale_version):
+            response = webutils.record_session_events(
+                [{"crate_id": crate_id, "quantity": 20, "weight": 21}], session_id
+            )
+        self.assertFalse(response["crates"][0]["success"])
+        self.assertIn("another device", response["crates"][0]["message"])
+        self.assertFalse(frappe.db.exists("Crate Activity", {"crate_id": crate_id, "session_id": session_id}))
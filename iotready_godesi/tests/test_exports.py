@@ -0,0 +1,136 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+import csv
+import importlib.util
+import os
+import shutil
+import unittest
+import uuid
+from datetime import date, datetime, timedelta
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from iotready_godesi import api, archive, exports
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+class TestColumnarExport(FrappeTestCase):
+    dataset = "daily_throughput"
+
+    def setUp(self):
+        self.folder = frappe.get_site_path("private", "files", exports.EXPORT_FOLDER, self.dataset)
+        shutil.rmtree(self.folder, ignore_errors=True)
+        frappe.defaults.clear_default(exports.WATERMARK_KEY.format(dataset=self.dataset), parent="__global")
+        self.day = date.today() - timedelta(days=1)
+        frappe.db.sql("DELETE FROM `tabGo Desi Daily Throughput` WHERE period_start = %s", self.day)
+        for index, warehouse in enumerate(["Export A", "Export B / Cold"]):
+            doc = frappe.new_doc("Go Desi Daily Throughput")
+            doc.update({"period_start": self.day, "warehouse": warehouse, "activity": "Procurement", "crates": index + 1})
+            doc.set_new_name()
+            doc.creation = doc.modified = datetime.now() - timedelta(hours=1)
+            doc.db_insert()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def read(self):
+        import pyarrow.dataset
+
+        return pyarrow.dataset.dataset(self.folder, partitioning="hive").to_table().to_pylist()
+
+    def test_export_is_partitioned_and_incremental(self):
+        self.assertGreaterEqual(exports.export_dataset(self.dataset), 2)
+        rows = [row for row in self.read() if str(row["export_date"]) == str(self.day)]
+        self.assertEqual({row["warehouse"] for row in rows}, {"Export A", "Export B / Cold"})
+        self.assertFalse([name for _, _, files in os.walk(self.folder) for name in files if name.endswith(".tmp")])
+        # Nothing new since the watermark
+        self.assertEqual(exports.export_dataset(self.dataset), 0)
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+class TestArchivedActivityExport(FrappeTestCase):
+    dataset = "crate_activity"
+
+    def setUp(self):
+        if not archive.archive_exists():
+            self.skipTest("No Crate Activity Archive on this site")
+        self.folder = frappe.get_site_path("private", "files", exports.EXPORT_FOLDER, self.dataset)
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_archived_activities_are_exported(self):
+        modified = datetime.now() - timedelta(hours=1)
+        exports.set_watermark(self.dataset, modified - timedelta(seconds=1), "")
+        names = []
+        for _ in range(2):
+            doc = frappe.new_doc("Crate Activity")
+            doc.update({"crate_id": f"EX-{uuid.uuid4().hex[:10].upper()}", "status": "Completed", "activity": "Procurement"})
+            doc.set_new_name()
+            doc.creation = doc.modified = modified
+            doc.db_insert()
+            names.append(doc.name)
+        columns = ", ".join(f"`{column}`" for column, _ in archive.get_columns(archive.HOT_TABLE))
+        frappe.db.sql(
+            f"INSERT INTO `{archive.ARCHIVE_TABLE}` ({columns}) SELECT {columns} FROM `{archive.HOT_TABLE}` WHERE name = %s",
+            names[0],
+        )
+        frappe.db.delete("Crate Activity", {"name": names[0]})
+        exports.export_dataset(self.dataset)
+
+        import pyarrow.dataset
+
+        exported = pyarrow.dataset.dataset(self.folder, partitioning="hive").to_table().column("name").to_pylist()
+        self.assertEqual(sorted(name for name in exported if name in names), sorted(names))
+
+
+class TestCsvExport(FrappeTestCase):
+    def insert_activities(self, count, **fields):
+        for index in range(count):
+            doc = frappe.new_doc("Crate Activity")
+            doc.update({"crate_id": f"CSV-{uuid.uuid4().hex[:10].upper()}", "status": "Completed", **fields})
+            doc.set_new_name()
+            doc.db_insert()
+
+    def export(self, **kwargs):
+        chunks = list(exports.iter_csv(*exports.get_csv_query(**kwargs)))
+        return chunks, list(csv.reader("".join(chunks).splitlines()))
+
+    def test_session_is_streamed_in_chunks(self):
+        session_id = uuid.uuid4().hex
+        self.insert_activities(exports.CSV_ROWS_PER_WRITE + 1, session_id=session_id, activity="Procurement")
+        chunks, rows = self.export(session_id=session_id)
+        self.assertEqual(rows[0], exports.CSV_COLUMNS)
+        self.assertEqual(len(rows), exports.CSV_ROWS_PER_WRITE + 2)
+        # Header alone, one full chunk, then the remainder
+        self.assertEqual(len(chunks), 3)
+
+    def test_transfer_includes_both_sides(self):
+        reference_id = uuid.uuid4().hex
+        self.insert_activities(2, reference_id=reference_id, activity="Transfer Out")
+        self.insert_activities(1, linked_reference_id=reference_id, activity="Transfer In")
+        _, rows = self.export(reference_id=reference_id)
+        activities = [row[exports.CSV_COLUMNS.index("activity")] for row in rows[1:]]
+        self.assertEqual(sorted(activities), ["Transfer In", "Transfer Out", "Transfer Out"])
+
+    def test_response_is_read_after_request_connection_closes(self):
+        session_id = uuid.uuid4().hex
+        self.insert_activities(3, session_id=session_id, activity="Procurement")
+        # The stream reads on its own connection, which only sees committed rows
+        frappe.db.commit()
+        test_db = frappe.local.db
+        try:
+            # A connection of its own stands in for the request's, which is closed before the body is sent
+            frappe.connect(set_admin_as_user=False)
+            response = api.export_crates_csv(session_id=session_id)
+            frappe.db.close()
+            self.assertEqual(response.headers["X-Accel-Buffering"], "no")
+            rows = list(csv.reader(response.get_data(as_text=True).splitlines()))
+        finally:
+            frappe.local.db = test_db
+            frappe.db.delete("Crate Activity", {"session_id": session_id})
+            frappe.db.commit()
+        self.assertEqual(rows[0], exports.CSV_COLUMNS)
+        self.assertEqual(len(rows), 4)
@@ -0,0 +1,128 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+import time
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import frappe
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from frappe.tests.utils import FrappeTestCase
+
+from iotready_godesi import firebase_auth
+
+PROJECT_ID = "godesi-test"
+KID = "test-key"
+EMAIL = "firebase-auth-test@example.com"
+
+
+def make_certificate(private_key):
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.test")])
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(private_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(datetime.utcnow() - timedelta(days=1))
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .sign(private_key, hashes.SHA256())
+    )
+    return certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+
+class TestFirebaseAuth(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        cls.certificate = make_certificate(cls.private_key)
+        if not frappe.db.exists("User", EMAIL):
+            frappe.get_doc(
+                {"doctype": "User", "email": EMAIL, "first_name": "Firebase Test", "send_welcome_email": 0}
+            ).insert(ignore_permissions=True)
+
+    def setUp(self):
+        firebase_auth.verified_tokens.clear()
+        firebase_auth.signing_keys.update({"keys": {}, "expires_at": 0})
+        self.fetches = 0
+
+    def fetcher(self, max_age=3600):
+        def fetch():
+            self.fetches += 1
+            return {KID: self.certificate}, max_age
+
+        return fetch
+
+    def make_token(self, expires_in=3600, **claims):
+        now = int(time.time())
+        payload = {
+            "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+            "aud": PROJECT_ID,
+            "sub": uuid.uuid4().hex,
+            "iat": now,
+            "exp": now + expires_in,
+            "email": EMAIL,
+        }
+        payload.update(claims)
+        return jwt.encode(payload, self.private_key, algorithm="RS256", headers={"kid": KID})
+
+    def test_valid_token_resolves_user(self):
+        token = self.make_token()
+        self.assertEqual(firebase_auth.get_user_from_token(token, PROJECT_ID, self.fetcher()), EMAIL)
+
+    def test_verified_token_is_cached(self):
+        token = self.make_token()
+        with patch.object(firebase_auth, "verify_id_token", wraps=firebase_auth.verify_id_token) as verify:
+            for _ in range(3):
+                firebase_auth.get_user_from_token(token, PROJECT_ID, self.fetcher())
+            self.assertEqual(verify.call_count, 1)
+            # Another worker finds the token in Redis
+            firebase_auth.verified_tokens.clear()
+            self.assertEqual(firebase_auth.get_user_from_token(token, PROJECT_ID, self.fetcher()), EMAIL)
+            self.assertEqual(verify.call_count, 1)
+
+    def test_local_cache_honours_expiry(self):
+        token = self.make_token(expires_in=1)
+        firebase_auth.get_user_from_token(token, PROJECT_ID, self.fetcher())
+        entry = firebase_auth.verified_tokens[firebase_auth.get_token_hash(token)]
+        entry["exp"] = time.time() - 1
+        self.assertIsNone(firebase_auth.get_local(firebase_auth.get_token_hash(token)))
+
+    def test_signing_keys_follow_max_age(self):
+        firebase_auth.verify_id_token(self.make_token(), PROJECT_ID, self.fetcher(max_age=3600))
+        firebase_auth.verify_id_token(self.make_token(), PROJECT_ID, self.fetcher(max_age=3600))
+        self.assertEqual(self.fetches, 1)
+        firebase_auth.signing_keys["expires_at"] = time.time() - 1
+        firebase_auth.verify_id_token(self.make_token(), PROJECT_ID, self.fetcher())
+        self.assertEqual(self.fetches, 2)
+
+    def test_invalid_tokens_are_rejected(self):
+        other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        forged = jwt.encode(
+            {"aud": PROJECT_ID, "sub": "x", "iat": int(time.time()), "exp": int(time.time()) + 60},
+            other_key,
+            algorithm="RS256",
+            headers={"kid": KID},
+        )
+        for token in [
+            self.make_token(expires_in=-10),
+            self.make_token(aud="another-project"),
+            self.make_token(iss="https://example.com"),
+            forged,
+        ]:
+            with self.subTest(token=token[-12:]):
+                with self.assertRaises(frappe.AuthenticationError):
+                    firebase_auth.get_user_from_token(token, PROJECT_ID, self.fetcher())
+
+    def test_unknown_email_has_no_user(self):
+        token = self.make_token(email="nobody-firebase@example.com")
+        self.assertIsNone(firebase_auth.get_user_from_token(token, PROJECT_ID, self.fetcher()))
+
+    def test_max_age_is_read_from_cache_control(self):
+        self.assertEqual(firebase_auth.get_max_age("public, max-age=19302, must-revalidate, no-transform"), 19302)
+        self.assertEqual(firebase_auth.get_max_age(None), firebase_auth.DEFAULT_KEYS_MAX_AGE)
@@ -0,0 +1,88 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+import uuid
+from datetime import datetime, timedelta
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from iotready_godesi import genealogy
+
+
+def new_id(prefix="GN"):
+    return f"{prefix}-{uuid.uuid4().hex[:10].upper()}"
+
+
+def insert_activity(crate_id, activity, creation, **fields):
+    doc = frappe.new_doc("Crate Activity")
+    doc.update({"crate_id": crate_id, "activity": activity, "status": "Completed", **fields})
+    doc.set_new_name()
+    doc.creation = doc.modified = creation
+    doc.db_insert()
+    return doc
+
+
+class TestGenealogy(FrappeTestCase):
+    def test_split_chain_and_packages(self):
+        root, child, grandchild = new_id(), new_id(), new_id()
+        package = genealogy.get_package_node("PICK-GN", 1)
+        genealogy.add_edge(root, child)
+        genealogy.add_edge(child, grandchild)
+        genealogy.add_edge(grandchild, package, child_type="Package")
+
+        ancestors = genealogy.get_ancestors(package)
+        self.assertEqual([(row.node, row.depth) for row in ancestors], [(grandchild, 1), (child, 2), (root, 3)])
+        descendants = {node["id"]: node for node in genealogy.get_descendants(root)}
+        self.assertEqual(set(descendants), {child, grandchild, package})
+        self.assertEqual(descendants[package]["type"], "Package")
+        self.assertEqual(descendants[package]["parents"], [grandchild])
+
+    def test_edges_are_idempotent(self):
+        parent, child = new_id(), new_id()
+        genealogy.add_edge(parent, child)
+        genealogy.add_edge(parent, child)
+        self.assertEqual(frappe.db.count("Crate Genealogy", {"descendant": child}), 1)
+
+    def test_subtree_is_linked_to_new_parent(self):
+        # A child whose own splits were recorded first still links its whole subtree
+        root, child, grandchild = new_id(), new_id(), new_id()
+        genealogy.add_edge(child, grandchild)
+        genealogy.add_edge(root, child)
+        self.assertEqual([row.node for row in genealogy.get_ancestors(grandchild)], [child, root])
+
+    def test_reused_crate_cycles_are_separate(self):
+        crate_id = new_id()
+        start = datetime.now() - timedelta(days=30)
+        first = insert_activity(crate_id, "Procurement", start, supplier_id="SUP-1", item_code="ITEM-1")
+        first_pick = insert_activity(
+            crate_id, "Customer Picking", start + timedelta(days=1), picklist_id="PL-1", package_id=1
+        )
+        genealogy.crate_activity_on_update(first_pick)
+        second = insert_activity(crate_id, "Procurement", start + timedelta(days=10), supplier_id="SUP-2", item_code="ITEM-2")
+        second_pick = insert_activity(
+            crate_id, "Customer Picking", start + timedelta(days=11), picklist_id="PL-2", package_id=1
+        )
+        genealogy.crate_activity_on_update(second_pick)
+
+        first_node = genealogy.get_cycle_node(crate_id, first.name)
+        self.assertEqual([node["id"] for node in genealogy.get_descendants(first_node)], ["PL-1/1"])
+        ancestors = genealogy.get_ancestors("PL-2/1")
+        self.assertEqual([(row.crate_id, row.supplier_id, row.item_code) for row in ancestors], [(crate_id, "SUP-2", "ITEM-2")])
+        # A bare crate ID resolves to its current cycle
+        self.assertEqual(genealogy.resolve_node(crate_id), genealogy.get_cycle_node(crate_id, second.name))
+
+    def test_split_starts_child_cycle(self):
+        parent_id, child_id = new_id(), new_id()
+        start = datetime.now() - timedelta(days=5)
+        procurement = insert_activity(parent_id, "Procurement", start, supplier_id="SUP-3", item_code="ITEM-3")
+        split = insert_activity(child_id, "Crate Splitting", start + timedelta(hours=1), parent_crate_id=parent_id)
+        edge = genealogy.get_edge(split)
+        self.assertEqual(edge["parent"], genealogy.get_cycle_node(parent_id, procurement.name))
+        self.assertEqual(edge["child"], genealogy.get_cycle_node(child_id, split.name))
+        self.assertEqual(edge["parent_supplier_id"], "SUP-3")
+
+    def test_whole_crate_and_drafts_have_no_edge(self):
+        whole = frappe._dict(status="Completed", activity="Customer Picking", crate_id="A", package_id="A")
+        draft = frappe._dict(status="Draft", activity="Crate Splitting", crate_id="B", parent_crate_id="A")
+        self.assertIsNone(genealogy.get_edge(whole))
+        self.assertIsNone(genealogy.get_edge(draft))
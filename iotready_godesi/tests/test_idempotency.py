@@ -0,0 +1,37 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+import uuid
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from iotready_godesi import idempotency
+
+
+class TestIdempotency(FrappeTestCase):
+    def setUp(self):
+        self.key = f"test:{uuid.uuid4().hex}"
+
+    def tearDown(self):
+        frappe.cache().delete(idempotency.make_key(self.key))
+
+    def test_pending_key_turns_retry_away(self):
+        self.assertIsNone(idempotency.reserve(self.key))
+        with patch.object(idempotency, "PENDING_WAIT_SECONDS", 0):
+            with self.assertRaises(idempotency.RequestInProgressError):
+                idempotency.reserve(self.key)
+
+    def test_response_is_stored_only_on_commit(self):
+        idempotency.reserve(self.key)
+        idempotency.set_response(self.key, {"success": True})
+        self.assertIsNone(idempotency.get_response(self.key))
+        frappe.db.after_commit.run()
+        self.assertEqual(idempotency.reserve(self.key), {"success": True})
+
+    def test_rollback_releases_key(self):
+        idempotency.reserve(self.key)
+        idempotency.set_response(self.key, {"success": True})
+        frappe.db.rollback()
+        self.assertIsNone(idempotency.get_response(self.key))
+        self.assertIsNone(idempotency.reserve(self.key))
@@ -0,0 +1,42 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+"""
+Import-time budgets for the app's entry points. Heavy dependencies (erpnext controllers, firebase)
+must be imported on use, not when a worker first loads the API.
+Budgets come from the measured profile in benchmarks/import_profile.json; regenerate it with
+`bench execute iotready_godesi.benchmarks.imports.run --kwargs "{'save_profile': True}"`
+when an entry point legitimately gets heavier, and say why in the commit message.
+"""
+import unittest
+
+from iotready_godesi.benchmarks.imports import ENTRY_POINTS, load_profile, profile_import
+
+DEFERRED_MODULES = [
+    "firebase_admin",
+    "iotready_firebase",
+    "pyarrow",
+    "erpnext.selling.doctype.sales_order",
+    "erpnext.stock.doctype.pick_list",
+    "erpnext.stock.doctype.stock_entry",
+]
+
+
+class TestImportTime(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.profiles = {module: profile_import(module) for module in ENTRY_POINTS}
+
+    def test_import_budget(self):
+        budgets = load_profile().get("entry_points", {})
+        if not budgets:
+            self.skipTest("No measured import profile committed in benchmarks/import_profile.json")
+        for module, profile in self.profiles.items():
+            with self.subTest(module=module):
+                self.assertIn(module, budgets, "Entry point missing from the measured profile")
+                self.assertLessEqual(profile["total_ms"], budgets[module]["budget_ms"], profile["slowest"])
+
+    def test_heavy_modules_are_deferred(self):
+        for module, profile in self.profiles.items():
+            loaded = [m for m in profile["modules"] if m.startswith(tuple(DEFERRED_MODULES))]
+            with self.subTest(module=module):
+                self.assertEqual(loaded, [])
@@ -0,0 +1,46 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+import json
+import uuid
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from iotready_godesi import api, loadtest
+
+
+class TestIngest(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        frappe.set_user("Administrator")
+        loadtest.seed_master_data(handhelds=1)
+        cls.user = loadtest.get_user("source", 0)
+
+    def setUp(self):
+        frappe.set_user(self.user)
+        self.request = getattr(frappe.local, "request", None)
+
+    def tearDown(self):
+        frappe.local.request = self.request
+        frappe.set_user("Administrator")
+
+    def test_raw_ndjson_body(self):
+        session_id = api.get_new_activity_session("Procurement")["session_id"]
+        api.update_activity_session(
+            session_id, json.dumps({"supplier": loadtest.SUPPLIER, "item_code": loadtest.ITEM_CODE})
+        )
+        body = "\n".join(
+            json.dumps({"session_id": session_id, "crate_id": f"IN-{uuid.uuid4().hex[:10].upper()}", "quantity": 20, "weight": 21})
+            for _ in range(3)
+        )
+        frappe.local.request = Request(
+            EnvironBuilder(method="POST", data=body, content_type="application/x-ndjson").get_environ()
+        )
+        # As frappe.handler does while building form_dict
+        frappe.request.get_data()
+        result = api.ingest_session_events()
+        self.assertEqual(result["total"], 3)
+        self.assertEqual(result["succeeded"], 3, result["results"])
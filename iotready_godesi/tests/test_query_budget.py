@@ -0,0 +1,201 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+"""
+Query budgets for the scan endpoints. Each test counts the statements issued through frappe.db.sql
+and fails when a handler exceeds its per-request budget, when the queries each scanned crate adds
+exceed its per-crate budget, or when that per-crate cost changes with the size of the batch.
+Counts that must not grow with the number of picklists or destinations are checked the same way.
+
+    bench --site test.localhost run-tests --app iotready_godesi --module iotready_godesi.tests.test_query_budget
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from iotready_godesi import api, loadtest, picking, validations, webutils
+from iotready_godesi.benchmarks.queries import capture_queries
+
+# Ceilings, not targets. Raise them only with a reason in the commit message.
+QUERIES_PER_REQUEST = 150
+QUERIES_PER_CRATE = {
+    "Procurement": 30,
+    "Transfer Out": 30,
+    "Transfer In": 30,
+    "Customer Picking": 25,
+}
+BATCH_SIZES = [2, 5, 10]
+CONFIGURATION_QUERIES = 25
+ACTIVITY_CONTEXT_QUERIES = 15
+
+
+def count_queries(fn, *args, **kwargs):
+    with capture_queries() as queries:
+        fn(*args, **kwargs)
+    return len(queries)
+
+
+def new_crate_id():
+    return f"QB-{uuid.uuid4().hex[:10].upper()}"
+
+
+def procurement_crates(count):
+    return [{"crate_id": new_crate_id(), "quantity": 20, "weight": 21} for _ in range(count)]
+
+
+class TestQueryBudget(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        frappe.set_user("Administrator")
+        cls.warehouses = loadtest.seed_master_data(handhelds=1)
+        cls.user = loadtest.get_user("source", 0)
+
+    def setUp(self):
+        frappe.set_user(self.user)
+
+    def tearDown(self):
+        frappe.set_user("Administrator")
+
+    def start_session(self, activity, context=None):
+        session_id = api.get_new_activity_session(activity)["session_id"]
+        if context:
+            api.update_activity_session(session_id, json.dumps(context))
+        return session_id
+
+    def start_procurement_session(self):
+        return self.start_session("Procurement", {"supplier": loadtest.SUPPLIER, "item_code": loadtest.ITEM_CODE})
+
+    def record(self, session_id, crates):
+        response = webutils.record_session_events(crates, session_id)
+        self.assertTrue(all(c["success"] for c in response["crates"]), response["crates"])
+        return response
+
+    def stocked_crates(self, count, **fields):
+        """
+        Crates procured at the source warehouse, written directly so each handler is measured on its own.
+        """
+        crate_ids = [new_crate_id() for _ in range(count)]
+        frappe.set_user("Administrator")
+        for crate_id in crate_ids:
+            validations.maybe_create_crate(crate_id)
+            frappe.db.set_value(
+                "Crate",
+                crate_id,
+                {
+                    "is_available_for_procurement": 0,
+                    "procurement_timestamp": datetime.now() - timedelta(hours=1),
+                    "last_known_warehouse": self.warehouses[loadtest.SOURCE_WAREHOUSE],
+                    "last_known_grn_quantity": 20,
+                    "last_known_weight": 21,
+                    "item_code": loadtest.ITEM_CODE,
+                    "stock_uom": "Nos",
+                    "supplier_id": loadtest.SUPPLIER,
+                },
+            )
+        frappe.set_user(self.user)
+        return [{"crate_id": crate_id, **fields} for crate_id in crate_ids]
+
+    def transferred_crates(self, count):
+        crates = self.stocked_crates(count)
+        for crate in crates:
+            doc = frappe.new_doc("Crate Activity")
+            doc.update(
+                {
+                    "crate_id": crate["crate_id"],
+                    "activity": "Transfer Out",
+                    "status": "Completed",
+                    "reference_id": "QB-TRANSFER",
+                    "source_warehouse": self.warehouses[loadtest.SOURCE_WAREHOUSE],
+                    "target_warehouse": self.warehouses[loadtest.TARGET_WAREHOUSE],
+                }
+            )
+            doc.set_new_name()
+            doc.db_insert()
+        return crates
+
+    def assert_per_crate_budget(self, activity, session_id, make_crates):
+        """
+        Every batch size must cost the same number of queries per crate, within the activity's budget.
+        """
+        # Warm the document and configuration caches
+        self.record(session_id, make_crates(1))
+        single = count_queries(self.record, session_id, make_crates(1))
+        self.assertLessEqual(single, QUERIES_PER_REQUEST)
+        per_crate = {}
+        for size in BATCH_SIZES:
+            crates = make_crates(size)
+            per_crate[size] = (count_queries(self.record, session_id, crates) - single) / (size - 1)
+        self.assertEqual(len(set(per_crate.values())), 1, per_crate)
+        self.assertLessEqual(per_crate[BATCH_SIZES[0]], QUERIES_PER_CRATE[activity], per_crate)
+
+    def test_procurement_budget(self):
+        self.assert_per_crate_budget("Procurement", self.start_procurement_session(), procurement_crates)
+
+    def test_transfer_out_budget(self):
+        session_id = self.start_session(
+            "Transfer Out",
+            {"target_warehouse": self.warehouses[loadtest.TARGET_WAREHOUSE], "vehicle": loadtest.VEHICLE},
+        )
+        self.assert_per_crate_budget("Transfer Out", session_id, self.stocked_crates)
+
+    def test_transfer_in_budget(self):
+        self.user = loadtest.get_user("target", 0)
+        frappe.set_user(self.user)
+        session_id = self.start_session("Transfer In")
+        self.assert_per_crate_budget("Transfer In", session_id, self.transferred_crates)
+
+    def test_customer_picking_budget(self):
+        session_id = self.start_session("Customer Picking", {"picklist_id": "QB-PICK", "package_id": 1})
+        self.assert_per_crate_budget(
+            "Customer Picking", session_id, lambda count: self.stocked_crates(count, quantity=5)
+        )
+
+    def test_session_summary_is_constant(self):
+        session_id = self.start_procurement_session()
+        self.record(session_id, procurement_crates(2))
+        webutils.get_session_summary(session_id)
+        small = count_queries(webutils.get_session_summary, session_id)
+        self.record(session_id, procurement_crates(8))
+        large = count_queries(webutils.get_session_summary, session_id)
+        self.assertEqual(small, large)
+
+    def test_crate_list_context_is_constant(self):
+        session_id = self.start_procurement_session()
+        self.record(session_id, procurement_crates(2))
+        small = count_queries(webutils.get_crate_list_context, session_id, "Procurement")
+        self.record(session_id, procurement_crates(8))
+        large = count_queries(webutils.get_crate_list_context, session_id, "Procurement")
+        self.assertEqual(small, large)
+
+    def test_configuration_budget(self):
+        webutils.get_configuration()
+        self.assertLessEqual(count_queries(webutils.get_configuration), CONFIGURATION_QUERIES)
+
+    def test_activity_context_budget(self):
+        for activity in ["Procurement", "Transfer Out", "Customer Picking"]:
+            webutils.get_activity_context(activity)
+            with self.subTest(activity=activity):
+                self.assertLessEqual(count_queries(webutils.get_activity_context, activity), ACTIVITY_CONTEXT_QUERIES)
+
+    def test_target_warehouses_is_constant(self):
+        source = frappe.get_doc("Warehouse", self.warehouses[loadtest.SOURCE_WAREHOUSE])
+        webutils.get_target_warehouses()
+        small = count_queries(webutils.get_target_warehouses)
+        existing = {row.warehouse for row in source.destination_table}
+        for name in self.warehouses.values():
+            if name != source.name and name not in existing:
+                source.append("destination_table", {"warehouse": name})
+        source.save(ignore_permissions=True)
+        webutils.get_target_warehouses()
+        large = count_queries(webutils.get_target_warehouses)
+        self.assertEqual(len(webutils.get_target_warehouses()), len(source.destination_table))
+        self.assertEqual(small, large)
+
+    def test_package_ids_is_constant(self):
+        small = count_queries(picking.get_package_ids, ["QB-PICK-1"])
+        large = count_queries(picking.get_package_ids, [f"QB-PICK-{i}" for i in range(10)])
+        self.assertEqual(small, large)
+        self.assertEqual(picking.get_package_ids([]), {})
@@ -0,0 +1,63 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+import uuid
+from datetime import datetime, timedelta
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from iotready_godesi import genealogy, recalls
+from iotready_godesi.tests.test_genealogy import insert_activity
+
+
+def new_id(prefix):
+    return f"{prefix}-{uuid.uuid4().hex[:10].upper()}"
+
+
+class TestRecalls(FrappeTestCase):
+    def test_recall_lists_crates_and_downstream(self):
+        batch_id = new_id("RB")
+        crates = [new_id("RC") for _ in range(3)]
+        start = datetime.now() - timedelta(hours=3)
+        for crate_id in crates:
+            insert_activity(crate_id, "Procurement", start, source_warehouse="WH-RC")
+        recalls.index_batch_crates(batch_id, None, [(crate_id, None) for crate_id in crates])
+        # Reprinting a label does not index the crate twice
+        recalls.index_batch_crates(batch_id, None, [(crates[0], None)])
+        pick = insert_activity(
+            crates[0], "Customer Picking", start + timedelta(hours=1), picklist_id="PICK-RC", package_id=1
+        )
+        genealogy.crate_activity_on_update(pick)
+
+        recall = recalls.get_batch_recall(batch_id)
+        self.assertEqual([crate.crate_id for crate in recall["crates"]], sorted(crates))
+        self.assertEqual(frappe.db.count("GoDesi Batch Crate", {"batch_id": batch_id}), 3)
+        downstream = {crate.crate_id: crate.downstream for crate in recall["crates"]}
+        self.assertEqual([node["id"] for node in downstream[crates[0]]], ["PICK-RC/1"])
+        self.assertEqual(downstream[crates[1]], [])
+
+    def test_reused_crate_is_followed_through_its_labelled_cycle_only(self):
+        batch_id = new_id("RB")
+        crate_id = new_id("RC")
+        start = datetime.now() - timedelta(days=20)
+        insert_activity(crate_id, "Procurement", start, source_warehouse="WH-FIRST", target_warehouse="WH-FIRST")
+        recalls.insert_batch_crates([(batch_id, crate_id, "WH-FIRST", None, start + timedelta(minutes=1))])
+        first_pick = insert_activity(
+            crate_id, "Customer Picking", start + timedelta(days=1), source_warehouse="WH-FIRST",
+            picklist_id="PL-FIRST", package_id=1,
+        )
+        genealogy.crate_activity_on_update(first_pick)
+        insert_activity(crate_id, "Procurement", start + timedelta(days=10), source_warehouse="WH-SECOND")
+        second_pick = insert_activity(
+            crate_id, "Customer Picking", start + timedelta(days=11), source_warehouse="WH-SECOND",
+            picklist_id="PL-SECOND", package_id=1,
+        )
+        genealogy.crate_activity_on_update(second_pick)
+
+        crate = recalls.get_batch_recall(batch_id)["crates"][0]
+        self.assertTrue(crate.reused)
+        self.assertEqual(crate.current_warehouse, "WH-FIRST")
+        self.assertEqual([node["id"] for node in crate.downstream], ["PL-FIRST/1"])
+
+    def test_unknown_batch_is_empty(self):
+        self.assertEqual(recalls.get_batch_recall(new_id("RB"))["crates"], [])
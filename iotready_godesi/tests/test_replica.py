@@ -0,0 +1,62 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from iotready_godesi import replica
+
+
+@replica.read_only(session_arg="session_id")
+def read_connection(session_id=None):
+    return frappe.db.sql("SELECT @@hostname, @@port")[0], replica.is_active()
+
+
+class TestReplica(FrappeTestCase):
+    def setUp(self):
+        replica.replica_down_until = 0
+
+    def tearDown(self):
+        replica.replica_down_until = 0
+
+    def test_primary_without_replica_config(self):
+        with patch.dict(frappe.local.conf, {"read_from_replica": 0}):
+            self.assertFalse(read_connection()[1])
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        primary = frappe.local.db
+        with patch.dict(frappe.local.conf, {"read_from_replica": 1, "replica_host": "127.0.0.1", "replica_db_port": 1}):
+            _, on_replica = read_connection()
+            self.assertFalse(on_replica)
+            self.assertIs(frappe.local.db, primary)
+            # The replica is not retried on every call
+            self.assertFalse(replica.use_replica())
+
+    def test_failed_replica_connection_is_closed(self):
+        primary = frappe.local.db
+        broken = MagicMock()
+        broken.sql.side_effect = Exception("replica gone")
+        frappe.local.replica_db = broken
+        self.assertFalse(replica.switch_to_replica())
+        broken.close.assert_called_once()
+        self.assertIs(frappe.local.db, primary)
+        self.assertFalse(hasattr(frappe.local, "replica_db"))
+
+    def test_lag_guard_keeps_recent_writers_on_primary(self):
+        with patch.dict(frappe.local.conf, {"read_from_replica": 1, "replica_host": "127.0.0.1"}):
+            replica.mark_write("REPLICA-TEST-SESSION")
+            self.assertFalse(replica.use_replica("REPLICA-TEST-SESSION"))
+            self.assertTrue(replica.has_recent_write())
+        for key in replica.get_write_keys("REPLICA-TEST-SESSION"):
+            frappe.cache().delete_value(key)
+
+    @unittest.skipUnless(frappe.conf.get("replica_host"), "No replica configured")
+    def test_reads_from_replica(self):
+        primary_connection = frappe.db.sql("SELECT @@hostname, @@port")[0]
+        with patch.dict(frappe.local.conf, {"read_from_replica": 1}):
+            replica_connection, on_replica = read_connection("REPLICA-TEST-UNWRITTEN")
+        self.assertTrue(on_replica)
+        self.assertNotEqual(replica_connection, primary_connection)
+        self.assertFalse(replica.is_active())
@@ -0,0 +1,88 @@
+# Copyright (c) 2026, IoTReady and Contributors
+# See license.txt
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from iotready_godesi import archive, loadtest, rollups
+
+
+class TestRollups(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        frappe.set_user("Administrator")
+        cls.warehouses = loadtest.seed_master_data(handhelds=1)
+        cls.warehouse = cls.warehouses[loadtest.SOURCE_WAREHOUSE]
+
+    def setUp(self):
+        self.hour = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+        frappe.db.set_global(rollups.WATERMARK_KEY, str(self.hour - timedelta(seconds=1)))
+
+    def insert_activity(self, weight):
+        doc = frappe.new_doc("Crate Activity")
+        doc.update(
+            {
+                "crate_id": f"RU-{uuid.uuid4().hex[:10].upper()}",
+                "activity": "Procurement",
+                "status": "Completed",
+                "source_warehouse": self.warehouse,
+                "item_code": loadtest.ITEM_CODE,
+                "grn_quantity": 20,
+                "crate_weight": weight,
+                "moisture_loss": 0.5,
+                "actual_loss": 0.25,
+            }
+        )
+        doc.set_new_name()
+        doc.creation = doc.modified = self.hour + timedelta(minutes=10)
+        doc.db_insert()
+        return doc
+
+    def update(self):
+        with patch.object(rollups, "SAFETY_LAG_MINUTES", 0):
+            return rollups.update_throughput_rollups()
+
+    def get_row(self, period):
+        rows = rollups.get_throughput(self.hour.date(), self.hour.date(), period, self.warehouse, "Procurement")
+        return [row for row in rows if period == "Daily" or row.period_start == self.hour]
+
+    def test_rollups_follow_changes(self):
+        before = self.get_row("Daily")
+        before_crates = before[0].crates if before else 0
+        first = self.insert_activity(21)
+        self.insert_activity(22)
+        self.update()
+        hourly = self.get_row("Hourly")[0]
+        self.assertGreaterEqual(hourly.weight, 43)
+        self.assertEqual(self.get_row("Daily")[0].crates, before_crates + 2)
+        # A modified row moves its bucket without being counted twice
+        frappe.db.set_value("Crate Activity", first.name, "crate_weight", 25, update_modified=True)
+        self.update()
+        self.assertEqual(self.get_row("Daily")[0].crates, before_crates + 2)
+        self.assertEqual(self.get_row("Hourly")[0].weight, hourly.weight + 4)
+
+    def test_watermark_moves(self):
+        self.update()
+        watermark = frappe.utils.get_datetime(frappe.db.get_global(rollups.WATERMARK_KEY))
+        self.assertGreater(watermark, self.hour)
+        self.assertEqual(self.update()["hours"], 0)
+
+    def test_archived_activities_are_counted(self):
+        if not archive.archive_exists():
+            self.skipTest("No Crate Activity Archive on this site")
+        before = self.get_row("Daily")
+        before_crates = before[0].crates if before else 0
+        moved = self.insert_activity(21)
+        self.insert_activity(22)
+        columns = ", ".join(f"`{column}`" for column, _ in archive.get_columns(archive.HOT_TABLE))
+        frappe.db.sql(
+            f"INSERT INTO `{archive.ARCHIVE_TABLE}` ({columns}) SELECT {columns} FROM `{archive.HOT_TABLE}` WHERE name = %s",
+            moved.name,
+        )
+        frappe.db.delete("Crate Activity", {"name": moved.name})
+        self.update()
+        self.assertEqual(self.get_row("Daily")[0].crates, before_crates + 2)
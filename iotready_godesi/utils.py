@@ -1,7 +1,10 @@
 import frappe
 import json
 from datetime import datetime 
-from iotready_godesi import validations
+from iotready_godesi import crate_ids, recalls, validations
+
+# Upper bound for one bulk label request; a pallet is a few hundred crates
+MAX_BULK_LABELS = 1000
 
 @frappe.whitelist()
 def maybe_create_batch(batch_id, warehouse_id):
@@ -69,33 +72,95 @@ def delete_draft_crate_activities(crate_id, activity_filter=None):
         print(str(e))
 
 
-@frappe.whitelist()
-def generate_label(
-    warehouse_id: str, crate_id: str, item_code: str, quantity: int, weight: float
-):
+def get_label_context(warehouse_id: str):
+    """
+    Template and batch for labels printed at `warehouse_id` now. Creates today's batch if needed.
+    """
     today = datetime.now().strftime("%d%m%y")
     now = datetime.now().strftime("%H:%M %p")
-    prefix = frappe.db.get_value("Warehouse", warehouse_id, "batch_prefix")
+    warehouse = frappe.db.get_value(
+        "Warehouse", warehouse_id, ["batch_prefix", "crate_label_template"], as_dict=True
+    )
+    prefix = warehouse.batch_prefix
     if not prefix:
         prefix = warehouse_id.split("-")[0].replace(" ", "")
     batch_id = f"{prefix}{today}"
     maybe_create_batch(batch_id, warehouse_id)
-    template = frappe.db.get_value("Warehouse", warehouse_id, "crate_label_template")
-    if not template:
+    if not warehouse.crate_label_template:
         frappe.throw("Please configure crate label template for this warehouse.")
-    item_name = frappe.db.get_value("Item", item_code, "item_name")
+    return {"template": warehouse.crate_label_template, "batch_id": batch_id, "time": now}
+
+
+def render_label(context: dict, crate_id: str, item_name: str, quantity, weight):
     label = (
-        template.replace("{qr_code}", crate_id)
+        context["template"].replace("{qr_code}", crate_id)
         .replace("{description1}", item_name[:15])
         .replace("{description2}", item_name[15:30])
-        .replace("{quantity}", f"{quantity} pcs")
-        .replace("{weight}", f"{weight} KG")
-        .replace("{batch_id}", batch_id)
-        .replace("{time}", now)
+        .replace("{quantity}", f"{quantity} pcs" if quantity is not None else "")
+        .replace("{weight}", f"{weight} KG" if weight is not None else "")
+        .replace("{batch_id}", context["batch_id"])
+        .replace("{time}", context["time"])
     )
     return label + "\n"
 
 
+@frappe.whitelist()
+def generate_label(
+    warehouse_id: str, crate_id: str, item_code: str, quantity: int, weight: float
+):
+    context = get_label_context(warehouse_id)
+    item_name = frappe.db.get_value("Item", item_code, "item_name")
+    recalls.index_batch_crates(context["batch_id"], warehouse_id, [(crate_id, item_code)])
+    return render_label(context, crate_id, item_name, quantity, weight)
+
+
+def reserve_crate_ids(count: int):
+    return crate_ids.get_block_crate_ids(crate_ids.reserve_block(count))
+
+
+def generate_labels(warehouse_id: str, crates: list, reserve: bool = False):
+    """
+    Labels for many crates as one printer stream. Template, batch and item names are resolved and the crates
+    indexed under the batch upfront, so the returned generator only formats strings and can be consumed
+    after the request's DB work is done.
+    Crates without a crate_id get a freshly reserved ID when `reserve` is set.
+    Returns (crate_ids, generator).
+    """
+    if len(crates) > MAX_BULK_LABELS:
+        frappe.throw(f"At most {MAX_BULK_LABELS} labels per request.")
+    context = get_label_context(warehouse_id)
+    item_codes = list({crate["item_code"] for crate in crates if crate.get("item_code")})
+    item_names = {}
+    if item_codes:
+        item_names = dict(
+            frappe.get_all("Item", filters={"name": ["in", item_codes]}, fields=["name", "item_name"], as_list=True)
+        )
+    missing = [crate for crate in crates if not crate.get("crate_id")]
+    if missing:
+        if not reserve:
+            frappe.throw("crate_id missing from request")
+        for crate, crate_id in zip(missing, reserve_crate_ids(len(missing))):
+            crate["crate_id"] = crate_id
+    rows = [
+        (
+            crate["crate_id"].strip(),
+            item_names.get(crate.get("item_code"), ""),
+            crate.get("quantity"),
+            crate.get("weight"),
+        )
+        for crate in crates
+    ]
+    recalls.index_batch_crates(
+        context["batch_id"], warehouse_id, [(row[0], crate.get("item_code")) for row, crate in zip(rows, crates)]
+    )
+
+    def stream():
+        for row in rows:
+            yield render_label(context, *row)
+
+    return [row[0] for row in rows], stream()
+
+
 def get_configuration():
     """
     Called by app user to retrieve warehouse configuration.
@@ -1,5 +1,5 @@
 import frappe
-from iotready_godesi import utils
+from iotready_godesi import querylog, utils
 from datetime import datetime
 
 
@@ -97,14 +97,26 @@ def validate_crate_at_parent_warehouse(crate_id, target_warehouse):
     ), f"Crate {crate_id} not at {parent_warehouse}"
 
 
-def validate_procurement_quantity(quantity, crate_weight, item_code):
-    item = frappe.get_doc("Item", item_code)
+def get_procurement_weight_band(item, quantity):
+    """
+    Accepted crate weight range for `quantity` units of `item`. Shared with the offline validation bundle.
+    """
     expected_weight = (
         item.secondary_box_weight * quantity + item.tertiary_packaging_weight
     )
     lower_limit = expected_weight * (1 - item.lower_tolerance / 100)
     upper_limit = expected_weight * (1 + item.upper_tolerance / 100)
-    print(lower_limit, upper_limit)
+    return lower_limit, upper_limit
+
+
+def get_transfer_in_tolerance(item):
+    # The weight is unlikely to be exactly the same as last_known_weight
+    return min(item.lower_tolerance, item.upper_tolerance)
+
+
+def validate_procurement_quantity(quantity, crate_weight, item_code):
+    item = frappe.get_doc("Item", item_code)
+    lower_limit, upper_limit = get_procurement_weight_band(item, quantity)
     if crate_weight < lower_limit:
         raise Exception("Actual weight below expected weight.")
     elif crate_weight > upper_limit:
@@ -120,8 +132,7 @@ def validate_transfer_in_quantity(crate):
     # Two ways to validate:
     # 1. Compare to last_known_weight (most likely from Transfer Out)
     last_known_weight = crate_doc.last_known_weight
-    # Maybe add a tolerance as the weight is unlikely to be exactly the same as last_known_weight
-    tolerance = min(item.lower_tolerance, item.upper_tolerance)
+    tolerance = get_transfer_in_tolerance(item)
     lower_limit = last_known_weight * (1 - tolerance / 100)
     upper_limit = last_known_weight * (1 + tolerance / 100)
     if crate_weight < lower_limit:
@@ -180,7 +191,7 @@ def validate_submitted_transfer_out(crate_id, target_warehouse):
 def validate_submitted_transfer_out_v2(crate_id, target_warehouse):
     crate_doc = frappe.get_doc("Crate", crate_id)
     procurement_timestamp = crate_doc.procurement_timestamp
-    result = frappe.db.sql(
+    result = querylog.sql(
         """
         SELECT reference_id, source_warehouse 
         FROM `tabCrate Activity`
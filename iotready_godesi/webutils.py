@@ -1,7 +1,7 @@
 import frappe
 import json
 from datetime import datetime, timedelta
-from iotready_godesi import picking, validations, utils
+from iotready_godesi import concurrency, idempotency, instrumentation, manifests, picking, querylog, replica, validations, utils
 from iotready_warehouse_traceability_frappe import workflows
 from iotready_warehouse_traceability_frappe import utils as common_utils
 
@@ -30,14 +30,18 @@ def get_items():
 def get_target_warehouses():
     warehouse = utils.get_user_warehouse()
     warehouse_doc = frappe.get_cached_doc("Warehouse", warehouse)
+    warehouse_ids = [row.warehouse for row in warehouse_doc.destination_table]
+    warehouse_names = {}
+    if warehouse_ids:
+        warehouse_names = dict(
+            frappe.db.get_values("Warehouse", {"name": ["in", warehouse_ids]}, ["name", "warehouse_name"])
+        )
     destination_warehouses = []
-    for row in warehouse_doc.destination_table:
+    for warehouse_id in warehouse_ids:
         destination_warehouses.append(
             {
-                "warehouse_id": row.warehouse,
-                "warehouse_name": frappe.db.get_value(
-                    "Warehouse", row.warehouse, "warehouse_name"
-                ),
+                "warehouse_id": warehouse_id,
+                "warehouse_name": warehouse_names.get(warehouse_id),
             }
         )
     return destination_warehouses
@@ -55,6 +59,7 @@ def get_vehicles():
     return vehicles
 
 def crate_activities(crate_id) -> list[dict]:
+    # Reads the hot table only. Rows from earlier crate cycles live in the archive, see archive.get_crate_history.
     sql_query = """
         SELECT *
         FROM `tabCrate Activity`
@@ -67,7 +72,7 @@ def crate_activities(crate_id) -> list[dict]:
                     ) OR modified >= DATE(NOW() - INTERVAL 7 DAY))
         ORDER BY modified ASC
     """
-    activities = frappe.db.sql(sql_query, (crate_id, crate_id), as_dict=True)
+    activities = querylog.sql(sql_query, (crate_id, crate_id), as_dict=True)
     return activities
 
 
@@ -82,6 +87,36 @@ def get_crate_details(crate_id):
     return crate_details
 
 
+def get_crates_details(crate_ids) -> dict:
+    """
+    Same as get_crate_details for many crates, in one query. Crates without activities map to None.
+    """
+    crate_ids = list(dict.fromkeys(crate_ids))
+    if not crate_ids:
+        return {}
+    sql_query = """
+        SELECT ca.*
+        FROM `tabCrate Activity` ca
+        LEFT JOIN (
+            SELECT crate_id, MAX(modified) AS cycle_start
+            FROM `tabCrate Activity`
+            WHERE crate_id IN %(crate_ids)s AND activity IN ('Procurement', 'Crate Splitting')
+            GROUP BY crate_id
+        ) cycle ON cycle.crate_id = ca.crate_id
+        WHERE ca.crate_id IN %(crate_ids)s
+            AND ca.activity NOT IN ('Delete', 'Release', 'Identify', 'Identify Crate')
+            AND (ca.modified >= cycle.cycle_start OR ca.modified >= DATE(NOW() - INTERVAL 7 DAY))
+        ORDER BY ca.modified ASC
+    """
+    activities = querylog.sql(sql_query, {"crate_ids": tuple(crate_ids)}, as_dict=True)
+    crates = {crate_id: None for crate_id in crate_ids}
+    for a in activities:
+        if crates[a["crate_id"]] is None:
+            crates[a["crate_id"]] = {}
+        crates[a["crate_id"]].update(a)
+    return crates
+
+
 def get_crates(session_id, activity=None, completed=False, only_ids=False):
     filters = {
         "status": "Draft",
@@ -104,14 +139,10 @@ def get_crates(session_id, activity=None, completed=False, only_ids=False):
     WHERE status = %(status)s
     AND session_id = %(session_id)s
     """
-    crate_ids = frappe.db.sql(sql, filters, as_dict=True)
+    crate_ids = querylog.sql(sql, filters, as_dict=True)
     if only_ids:
         return [r["crate_id"] for r in crate_ids]
-    crates = {}
-    for row in crate_ids:
-        crate_id = row["crate_id"]
-        crates[crate_id] = get_crate_details(crate_id)
-    return crates
+    return get_crates_details([r["crate_id"] for r in crate_ids])
 
 def get_customer_picking_activities(session_id):
     filters = {
@@ -125,7 +156,7 @@ def get_customer_picking_activities(session_id):
     AND activity = 'Customer Picking'
     AND session_id = %(session_id)s
     """
-    activities = frappe.db.sql(sql, filters, as_dict=True)
+    activities = querylog.sql(sql, filters, as_dict=True)
     crates = {r["name"]:r for r in activities}
     return crates
 
@@ -138,33 +169,22 @@ def get_session_item_summary(session_id, activity):
         sql = """
         SELECT item_code, item_name, stock_uom, ROUND(SUM(grn_quantity),2) AS quantity, ROUND(SUM(last_known_grn_quantity),2) AS expected_quantity, ROUND(SUM(crate_weight),2) AS weight, ROUND(SUM(last_known_crate_weight),2) AS expected_weight, COUNT(*) AS `count` FROM `tabCrate Activity` WHERE session_id=%s GROUP BY item_code;
         """
-    return frappe.db.sql(sql, session_id, as_dict=True)
+    return querylog.sql(sql, session_id, as_dict=True)
 
 def get_session_crate_summary(session_id, activity=None):
-    if activity in ["Transfer In", "Bulk Transfer In", "Crate Tracking In"]:
-        sql = """
-        WITH session AS (
-    SELECT 
-        linked_reference_id
-    FROM 
-        `tabCrate Activity` WHERE session_id=%s
-    ),
-    transfer_out AS (
-    SELECT COUNT(DISTINCT crate_id) AS expected, reference_id
-    FROM `tabCrate Activity`
-    WHERE reference_id IN (SELECT linked_reference_id FROM session)
-    ),
-    transfer_in AS (
-    SELECT COUNT(DISTINCT crate_id) AS done, ROUND(SUM(grn_quantity),2) AS grn_quantity, ROUND(SUM(crate_weight),2) AS weight, ROUND(SUM(moisture_loss), 2) AS moisture, ROUND(SUM(actual_loss), 2) AS actual_loss, linked_reference_id
-    FROM `tabCrate Activity`
-    WHERE linked_reference_id IN (SELECT linked_reference_id FROM session)
-    )
-    SELECT transfer_out.expected, transfer_out.expected - transfer_in.done AS pending, transfer_in.done, transfer_in.grn_quantity, transfer_in.weight, transfer_in.moisture, transfer_in.actual_loss
-    FROM transfer_out
-    JOIN transfer_in ON transfer_in.linked_reference_id = transfer_out.reference_id;
-        """
-    else:
-        sql = """
+    if activity in manifests.TRANSFER_IN_ACTIVITIES:
+        summary = manifests.get_session_manifest_summary(session_id)
+        if summary:
+            return summary
+        return {
+            "expected": 0,
+            "done": 0,
+            "pending": 0,
+            "weight": 0,
+            "moisture": 0,
+            "actual_loss": 0,
+        }
+    sql = """
         WITH data AS (
     SELECT 
         COUNT(ca2.crate_id) AS expected, ca1.crate_id, ca1.crate_weight AS weight, CASE WHEN ca1.stock_uom='Kg' THEN ca1.crate_weight - ca1.grn_quantity ELSE 0 END AS moisture, ca1.actual_loss, ca1.linked_reference_id
@@ -179,7 +199,7 @@ def get_session_crate_summary(session_id, activity=None):
     )
     SELECT SUM(expected + CASE WHEN linked_reference_id IS NULL THEN done ELSE 0 END) AS expected, SUM(done) AS done, SUM(expected + CASE WHEN linked_reference_id IS NULL THEN done ELSE 0 END) - SUM(done) AS pending, ROUND(SUM(weight),2) AS weight, ROUND(SUM(moisture),2) AS moisture, ROUND(SUM(actual_loss),2) AS actual_loss FROM agg;
         """
-    summary = frappe.db.sql(sql, session_id, as_dict=True)
+    summary = querylog.sql(sql, session_id, as_dict=True)
     if summary:
         return summary[0]
     return {
@@ -204,6 +224,7 @@ def get_activity_by_session_id(session_id):
     return None
 
 
+@replica.read_only(session_arg="session_id")
 def get_crate_list_context(session_id, activity=None):
     if not activity:
         activity = get_activity_by_session_id(session_id)
@@ -247,6 +268,28 @@ def get_activity_context(activity: str):
     return context
 
 
+def get_session_room(session_id):
+    """
+    Realtime room for a session. Clients join it with frappe.realtime.task_subscribe.
+    """
+    return f"godesi-session-{session_id}"
+
+
+def publish_session_summary(session_id, summary):
+    """
+    Pushes the incremental summary of a scan batch to everyone watching the session.
+    `summary` is the same JSON string returned to the scanner, so clients apply it with update().
+    """
+    frappe.publish_realtime(
+        "godesi_session_summary",
+        message={"session_id": session_id, "summary": summary},
+        task_id=get_session_room(session_id),
+        after_commit=True,
+    )
+
+
+@instrumentation.instrument
+@replica.read_only(session_arg="session_id")
 def get_session_summary(session_id: str):
     activity = None
     session_context = workflows.get_activity_session(session_id)
@@ -255,6 +298,7 @@ def get_session_summary(session_id: str):
     return get_crate_list_context(session_id, activity)
 
 
+@instrumentation.instrument(phase_name="create")
 def create_crate_activity(
     crate,
     session_id,
@@ -291,6 +335,7 @@ def create_crate_activity(
     return doc
 
 
+@instrumentation.instrument
 def procurement(crate: dict, activity: str):
     """
     Validates crate and adds to Purchase Receipt
@@ -303,25 +348,30 @@ def procurement(crate: dict, activity: str):
     session_id = crate["session_id"]
     item_code = crate["item_code"]
     supplier = crate["supplier"]
-    validations.validate_item(item_code)
-    validations.validate_supplier(supplier)
-    validations.validate_crate_availability(crate_id)
-    validations.validate_procurement_quantity(
-        crate["quantity"], crate["weight"], item_code
-    )
+    with instrumentation.phase("validate"):
+        validations.validate_item(item_code)
+        validations.validate_supplier(supplier)
+        validations.maybe_create_crate(crate_id)
+        version = concurrency.get_crate_version(crate_id)
+        validations.validate_crate_availability(crate_id)
+        validations.validate_procurement_quantity(
+            crate["quantity"], crate["weight"], item_code
+        )
+    concurrency.claim_crate(crate_id, version)
     create_crate_activity(
         crate=crate,
         session_id=session_id,
         activity=activity,
         source_warehouse=source_warehouse,
     )
-    label = utils.generate_label(
-        warehouse_id=source_warehouse,
-        crate_id=crate_id,
-        item_code=item_code,
-        quantity=crate["quantity"],
-        weight=crate["weight"]
-    )
+    with instrumentation.phase("label"):
+        label = utils.generate_label(
+            warehouse_id=source_warehouse,
+            crate_id=crate_id,
+            item_code=item_code,
+            quantity=crate["quantity"],
+            weight=crate["weight"]
+        )
     return {
         "crate_id": crate_id,
         "success": True,
@@ -330,6 +380,7 @@ def procurement(crate: dict, activity: str):
         "allow_final_crate": False,
     }
 
+@instrumentation.instrument
 def transfer_out(crate: dict, activity: str):
     """
     For each crate process the stock transfer out request.
@@ -341,14 +392,17 @@ def transfer_out(crate: dict, activity: str):
     session_id = crate["session_id"]
     source_warehouse = utils.get_user_warehouse()
     target_warehouse = crate["target_warehouse"]
-    validations.validate_crate(crate_id)
-    validations.validate_crate_in_use(crate_id)
-    validations.validate_source_warehouse(crate_id, source_warehouse)
-    validations.validate_destination(source_warehouse, target_warehouse)
-    validations.validate_vehicle(crate["vehicle"])
-    validations.validate_not_existing_transfer_out(
-        crate_id=crate_id, activity=activity, source_warehouse=source_warehouse
-    )
+    with instrumentation.phase("validate"):
+        validations.validate_crate(crate_id)
+        version = concurrency.get_crate_version(crate_id)
+        validations.validate_crate_in_use(crate_id)
+        validations.validate_source_warehouse(crate_id, source_warehouse)
+        validations.validate_destination(source_warehouse, target_warehouse)
+        validations.validate_vehicle(crate["vehicle"])
+        validations.validate_not_existing_transfer_out(
+            crate_id=crate_id, activity=activity, source_warehouse=source_warehouse
+        )
+    concurrency.claim_crate(crate_id, version)
     create_crate_activity(
         crate=crate,
         session_id=session_id,
@@ -363,6 +417,7 @@ def transfer_out(crate: dict, activity: str):
         "allow_final_crate": False,
     }
 
+@instrumentation.instrument
 def transfer_in(crate: dict, activity: str):
     """
     For each crate process the stock transfer in request.
@@ -373,20 +428,23 @@ def transfer_in(crate: dict, activity: str):
     crate_id = crate["crate_id"]
     target_warehouse = utils.get_user_warehouse()
     crate["target_warehouse"] = target_warehouse
-    validations.validate_crate(crate_id)
-    validations.validate_crate_in_use(crate_id)
-    source_warehouse = None
-    linked_reference_id, source_warehouse = validations.validate_submitted_transfer_out_v2(
-        crate_id, target_warehouse
-    )
-    validations.validate_not_existing_transfer_in(crate_id, target_warehouse)
-    if crate.get("weight"):
-        # carton was weighed
-        # validate weight vs quantity here
-        validations.validate_transfer_in_quantity(crate)
+    with instrumentation.phase("validate"):
+        validations.validate_crate(crate_id)
+        version = concurrency.get_crate_version(crate_id)
+        validations.validate_crate_in_use(crate_id)
+        source_warehouse = None
+        linked_reference_id, source_warehouse = validations.validate_submitted_transfer_out_v2(
+            crate_id, target_warehouse
+        )
+        validations.validate_not_existing_transfer_in(crate_id, target_warehouse)
+        if crate.get("weight"):
+            # carton was weighed
+            # validate weight vs quantity here
+            validations.validate_transfer_in_quantity(crate)
     crate["target_warehouse"] = target_warehouse
     crate["source_warehouse"] = source_warehouse
     crate["linked_reference_id"] = linked_reference_id
+    concurrency.claim_crate(crate_id, version)
     create_crate_activity(
         crate=crate,
         session_id=crate["session_id"],
@@ -403,6 +461,7 @@ def transfer_in(crate: dict, activity: str):
     }
 
 
+@instrumentation.instrument
 def customer_picking(crate: dict, activity: str):
     """
     Validates crate and adds to Purchase Receipt
@@ -421,8 +480,10 @@ def customer_picking(crate: dict, activity: str):
     if not crate.get("package_id"):
         frappe.throw("Need package ID for partial quantities")
     source_warehouse = utils.get_user_warehouse()
-    validations.validate_source_warehouse(crate_id, source_warehouse)
-    parent_crate = frappe.get_doc("Crate", crate_id)
+    with instrumentation.phase("validate"):
+        validations.validate_source_warehouse(crate_id, source_warehouse)
+        parent_crate = frappe.get_doc("Crate", crate_id)
+        version = frappe.utils.cint(parent_crate.get("godesi_version"))
     crate["stock_uom"] = parent_crate.stock_uom
     crate["item_code"] = parent_crate.item_code
     crate["supplier_id"] = parent_crate.supplier_id
@@ -447,6 +508,7 @@ def customer_picking(crate: dict, activity: str):
         frappe.throw("Picked quantity cannot be greater than last known quantity.")
     # elif crate["picked_quantity"] == parent_crate.last_known_grn_quantity:
     #     crate["package_id"] = crate_id
+    concurrency.claim_crate(crate_id, version)
     create_crate_activity(
         crate=crate,
         session_id=session_id,
@@ -592,6 +654,7 @@ activity_requirements = {
     # },
 }
 
+@instrumentation.instrument
 def get_configuration():
     """
     Called by app user to retrieve warehouse configuration.
@@ -620,6 +683,7 @@ def get_configuration():
     }
     return payload
 
+@instrumentation.instrument
 def identify_crate(crate_id: str):
     crate_details = get_crate_details(crate_id)
     response={
@@ -629,8 +693,82 @@ def identify_crate(crate_id: str):
     }
     return response
 
-def record_session_events(crates: list, session_id: str, metadata: str|None = ""):
-    
+def get_clean_session_context(session_id):
+    session_context = workflows.get_activity_session(session_id)
+    if not session_context:
+        return None
+    session_context.pop("crates", None)
+    session_context.pop("suppliers", None)
+    session_context.pop("items", None)
+    session_context.pop("open_material_requests", None)
+    return session_context
+
+
+def process_session_crate(crate_in: dict, session_id: str, activity: str):
+    """
+    Runs a single crate event through its activity handler and returns the per-crate response.
+    """
+    crate_in.update(get_clean_session_context(session_id) or {})
+    try:
+        validations.validate_mandatory_fields(crate_in, activity)
+        return allowed_activities[activity](crate_in, activity)
+    except Exception as e:
+        crate_out = {
+            "success": False,
+            "message": str(e),
+            "crate_id": crate_in.get("crate_id"),
+            "allow_final_crate": False,
+            "label": "",
+        }
+        if str(e) == "Quantity Under Limit":
+            crate_out["allow_final_crate"] = True
+        return crate_out
+
+
+def get_session_summary_payload(session_id: str, activity: str, crates: list, session_context=None):
+    """
+    Incremental summary for a batch: session totals plus the details of the crates in `crates`.
+    """
+    payload = {
+        "session_id": session_id,
+        "activity": activity,
+        "crates": {},
+        "item_summary": get_session_item_summary(session_id, activity),
+        "crate_summary": get_session_crate_summary(session_id, activity),
+    }
+    if activity in ["Customer Picking"]:
+        payload["crates"] = get_customer_picking_activities(session_id)
+    else:
+        session_crates = get_crates(session_id, activity=activity, only_ids=True)
+        # crate_count = len(session_crates)
+        # if len(session_crates) > 0:
+        #     last_crate_id = crates[-1].get("crate_id")
+        #     if last_crate_id and last_crate_id in session_crates:
+        #         last_crate = get_crate_details(last_crate_id)
+        #         if all(crate_out["success"] for crate_out in response["crates"]):
+        #             if activity not in ["Bulk Transfer In"]:
+        #                 response["ble"][workflows.WEIGHT_CHAR] = [
+        #                     f"{last_crate.get('crate_weight', 0)}KG | {crate_count} Crates"
+        #                 ]
+        crate_ids = [crate_in.get("crate_id") for crate_in in crates]
+        if activity in ["Crate Splitting"] and session_context:
+            crate_ids.append(session_context.get("parent_crate_id"))
+        payload["crates"] = get_crates_details(
+            [crate_id for crate_id in crate_ids if crate_id and crate_id in session_crates]
+        )
+    return payload
+
+
+@instrumentation.instrument
+def record_session_events(crates: list, session_id: str, metadata: str|None = "", idempotency_key: str|None = None):
+    """
+    `idempotency_key` identifies the whole batch. Crates may also carry their own `idempotency_key`.
+    A retried batch gets its stored response back; a retried crate that already succeeded is not re-processed.
+    """
+    batch_key = f"{session_id}:batch:{idempotency_key}" if idempotency_key else None
+    cached_response = idempotency.reserve(batch_key)
+    if cached_response:
+        return cached_response
     creation = datetime.now() + timedelta(hours=5, minutes=30)
     response = {
         "session_id": session_id,
@@ -649,7 +787,7 @@ def record_session_events(crates: list, session_id: str, metadata: str|None = ""
         metadata = json.loads(metadata)
         if isinstance(metadata, dict):
             workflows.update_activity_session(session_id, metadata)
-    session_context = workflows.get_activity_session(session_id)
+    session_context = get_clean_session_context(session_id)
     if not session_context:
         for crate_in in crates:
             crate_out = {
@@ -660,36 +798,36 @@ def record_session_events(crates: list, session_id: str, metadata: str|None = ""
                 "label": "",
             }
             response["crates"].append(crate_out)
+        idempotency.release(batch_key)
         return response
-    session_context.pop("crates", None)
-    session_context.pop("suppliers", None)
-    session_context.pop("items", None)
-    session_context.pop("open_material_requests", None)
     activity = session_context.get("activity")
     response.update(activity_requirements[activity])
-    for crate_in in crates:
-        session_context = workflows.get_activity_session(session_id)
-        session_context.pop("crates", None)
-        session_context.pop("suppliers", None)
-        session_context.pop("items", None)
-        session_context.pop("open_material_requests", None)
-        crate_in.update(session_context)
-        try:
-            validations.validate_mandatory_fields(crate_in, activity)
-            crate_out = allowed_activities[activity](crate_in, activity)
-            response["crates"].append(crate_out)
-        except Exception as e:
-            crate_out = {
-                "success": False,
-                "message": str(e),
-                "crate_id": crate_in.get("crate_id"),
-                "allow_final_crate": False,
-                "label": "",
-            }
-            if str(e) == "Quantity Under Limit":
-                response["ble"][workflows.LED_CHAR] = ["25,10,0"]
-                crate_out["allow_final_crate"] = True
-            response["crates"].append(crate_out)
+    # Claim every crate key before processing any, so a concurrent retry is turned away before it writes
+    crate_keys = [
+        f"{session_id}:crate:{crate_in['idempotency_key']}" if crate_in.get("idempotency_key") else None
+        for crate_in in crates
+    ]
+    cached_crates = []
+    try:
+        for crate_key in crate_keys:
+            cached_crates.append(idempotency.reserve(crate_key))
+    except idempotency.RequestInProgressError:
+        for crate_key, cached in zip(crate_keys, cached_crates):
+            if not cached:
+                idempotency.release(crate_key)
+        idempotency.release(batch_key)
+        raise
+    for crate_in, crate_key, crate_out in zip(crates, crate_keys, cached_crates):
+        if not crate_out:
+            crate_out = process_session_crate(crate_in, session_id, activity)
+            if crate_out["success"]:
+                idempotency.set_response(crate_key, crate_out)
+            else:
+                idempotency.release(crate_key)
+        if not crate_out["success"] and crate_out["allow_final_crate"]:
+            response["ble"][workflows.LED_CHAR] = ["25,10,0"]
+        response["crates"].append(crate_out)
+    replica.mark_write(session_id)
     session_context = workflows.get_activity_session(session_id)
     if activity in ["Customer Picking", "Crate Splitting", "Material Request"]:
         response["form"] = json.dumps({"refresh": True})
@@ -697,37 +835,13 @@ def record_session_events(crates: list, session_id: str, metadata: str|None = ""
         response["needs_submit"] = True
         if session_context.get("stock_uom") and session_context["stock_uom"] == "Nos":
             response["allow_edit_quantity"] = True
-    payload = {
-        "session_id": session_id,
-        "activity": activity,
-        "crates": {},
-        "item_summary": get_session_item_summary(session_id, activity),
-        "crate_summary": get_session_crate_summary(session_id, activity),
-    }
-    if activity in ["Customer Picking"]:
-        payload["crates"] = get_customer_picking_activities(session_id)
-    else:
-        session_crates = get_crates(session_id, activity=activity, only_ids=True)
-        # crate_count = len(session_crates)
-        # if len(session_crates) > 0:
-        #     last_crate_id = crates[-1].get("crate_id")
-        #     if last_crate_id and last_crate_id in session_crates:
-        #         last_crate = get_crate_details(last_crate_id)
-        #         if all(crate_out["success"] for crate_out in response["crates"]):
-        #             if activity not in ["Bulk Transfer In"]:
-        #                 response["ble"][workflows.WEIGHT_CHAR] = [
-        #                     f"{last_crate.get('crate_weight', 0)}KG | {crate_count} Crates"
-        #                 ]
-        for crate_in in crates:
-            crate_id = crate_in.get("crate_id")
-            if crate_id and crate_id in session_crates:
-                payload["crates"][crate_id] = get_crate_details(crate_id)
-        if activity in ["Crate Splitting"] and session_context:
-            parent_crate_id = session_context.get("parent_crate_id")
-            if parent_crate_id and parent_crate_id in session_crates:
-                payload["crates"][parent_crate_id] = get_crate_details(parent_crate_id)
-    response["summary"] = json.dumps(payload, default=common_utils.date_json_serial)
+    with instrumentation.phase("summarize"):
+        payload = get_session_summary_payload(session_id, activity, crates, session_context)
+        response["summary"] = json.dumps(payload, default=common_utils.date_json_serial)
+    publish_session_summary(session_id, response["summary"])
     if all(crate_out["success"] for crate_out in response["crates"]):
         response["ble"][workflows.LED_CHAR] = ["0,20,0"]
-    workflows.log_ingress(crates, activity, response, creation)
+    with instrumentation.phase("log_ingress"):
+        workflows.log_ingress(crates, activity, response, creation)
+    idempotency.set_response(batch_key, response)
     return response
@@ -1,8 +1,7 @@
 import frappe
 import json
-from iotready_godesi import webutils
+from iotready_godesi import firebase_auth, webutils
 from iotready_warehouse_traceability_frappe import utils, workflows
-from iotready_firebase import admin
 
 
 def get_context(context):
@@ -14,8 +13,9 @@ def get_context(context):
         frappe.local.flags.redirect_location = "/invalid_session"
         raise frappe.Redirect
     if frappe.session.user == "Guest":
-        user = admin.log_into_frappe_with_id_token(token)
-        frappe.set_user(user.email)
+        user = firebase_auth.login(token)
+        if user:
+            frappe.set_user(user)
     if frappe.session.user == "Guest":
         print("Redirecting to /login: Guest")
         frappe.local.flags.redirect_location = "/login"